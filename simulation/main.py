@@ -6,6 +6,7 @@ Factory Simulation - Main Entry Point
 import yaml
 import sys
 import os
+import argparse
 from pathlib import Path
 
 # Add src to path and ensure we're using the local modules
@@ -13,9 +14,10 @@ current_dir = Path(__file__).parent
 src_dir = current_dir / 'src'
 sys.path.insert(0, str(src_dir))
 
-# Import with explicit path to avoid conflicts
+# Import with explicit path to avoid conflicts. Reporting (pandas, matplotlib)
+# is imported only by the commands that produce a report, to keep startup fast
 from simulation import FactorySimulation
-from analysis.reporting import generate_report
+from experiments.cache import ResultCache
 
 def load_config(config_path=None):
     """Load configuration from YAML file"""
@@ -71,20 +73,316 @@ def get_default_config():
         }
     }
 
+def simulate_command(args):
+    """Run one simulation headless and print its KPIs as JSON (pandas and matplotlib are never loaded)"""
+    import json
+    import contextlib
+    
+    parser = argparse.ArgumentParser(prog='main.py simulate',
+                                     description='Run a config without report or plots and output its KPIs')
+    parser.add_argument('config', nargs='?', default='../config.yaml', help='Path to YAML config')
+    parser.add_argument('-o', '--output', default=None, help='Write the KPIs to this JSON file instead of stdout')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Keep running statistics only instead of the event log (constant memory)')
+    options = parser.parse_args(args)
+    
+    # stdout carries only the KPIs
+    with contextlib.redirect_stdout(sys.stderr):
+        config = load_config(options.config)
+    config['simulation'].setdefault('log_level', 'WARNING')
+    if options.streaming:
+        config['simulation']['streaming_kpis'] = True
+    
+    cache = ResultCache.from_config(config)
+    kpis = cache.get_kpis(config) if cache is not None else None
+    if kpis is None:
+        factory = FactorySimulation(config)
+        factory.simulate()
+        kpis = {name: float(value) for name, value in factory.data_collector.calculate_kpis().items()}
+        if cache is not None:
+            cache.put(config, kpis)
+    
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(kpis, f, indent=2)
+    else:
+        json.dump(kpis, sys.stdout, indent=2)
+        print()
+
+def approximate_command(args):
+    """Estimate a config's KPIs analytically, optionally checking the estimate against simulation"""
+    import json
+    import time
+    from approximation import FactoryApproximation
+    
+    parser = argparse.ArgumentParser(prog='main.py approximate',
+                                     description='Estimate KPIs in about a millisecond with a queueing approximation')
+    parser.add_argument('config', nargs='?', default='../config.yaml', help='Path to YAML config')
+    parser.add_argument('--validate', action='store_true',
+                        help='Also simulate the config and report the error of every estimate')
+    parser.add_argument('-n', '--replications', type=int, default=10, help='Replications for --validate')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('-o', '--output', default=None, help='Write the estimates (and validation) to this JSON file')
+    options = parser.parse_args(args)
+    
+    print("=== Factory Simulation - Analytical Estimate ===")
+    config = load_config(options.config)
+    if not options.validate:
+        started = time.perf_counter()
+        estimates = FactoryApproximation(config).estimate()
+        elapsed = time.perf_counter() - started
+        for name, value in estimates.items():
+            print(f"{name:<40} {value:10.3f}")
+        print(f"Estimated in {elapsed * 1e3:.2f} ms")
+        output = estimates
+    else:
+        from experiments.screening import validate_approximation
+        config['simulation'].setdefault('log_level', 'WARNING')
+        output = validate_approximation(config, options.replications, options.workers)
+        print(f"{'KPI':<40} {'estimate':>10} {'simulated':>10} {'+/-':>8} {'error':>8}")
+        for name, row in output['kpis'].items():
+            print(f"{name:<40} {row['estimate']:10.3f} {row['simulated']:10.3f} {row['half_width']:8.3f} "
+                  f"{row['relative_error']:8.1%}")
+        print(f"Estimated in {output['estimate_seconds'] * 1e3:.2f} ms, "
+              f"simulated {options.replications} replications in {output['simulate_seconds']:.1f}s")
+    
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(output, f, indent=2)
+
+def report_command(args):
+    """Regenerate the report of a saved run without simulating again"""
+    from analysis.storage import load_results
+    from analysis.reporting import generate_report
+    
+    parser = argparse.ArgumentParser(prog='main.py report',
+                                     description='Recompute KPIs and plots from the binary results of a run')
+    parser.add_argument('--from-results', required=True, metavar='DIR',
+                        help='Directory written by a run (results/data)')
+    parser.add_argument('--csv', action='store_true', help='Also export results/simulation_events.csv')
+    parser.add_argument('--draft', action='store_true', help='Render the plots at low resolution (fast)')
+    options = parser.parse_args(args)
+    
+    results, config = load_results(options.from_results)
+    if options.csv:
+        config['simulation']['export_csv'] = True
+    if options.draft:
+        config['simulation']['draft_plots'] = True
+    
+    # The loaded columns are memory-mapped from DIR, so the data is not saved again
+    generate_report(results, config, save_data=False)
+
+def replicate_command(args):
+    """Run independent replications of one configuration in parallel"""
+    from experiments.replication import replicate
+    from analysis.reporting import generate_replication_report
+    
+    parser = argparse.ArgumentParser(prog='main.py replicate',
+                                     description='Run N seeds of a config and report confidence intervals')
+    parser.add_argument('config', nargs='?', default='../config.yaml', help='Path to YAML config')
+    parser.add_argument('-n', '--replications', type=int, default=30, help='Number of replications')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the intervals')
+    parser.add_argument('--antithetic', action='store_true',
+                        help='Run each replication as an antithetic pair (twice the runs)')
+    parser.add_argument('--precision', type=float, default=None,
+                        help='Add replications until the CI half-width is at most this fraction of the mean')
+    parser.add_argument('--kpi', action='append', default=None,
+                        help='KPI the precision applies to (repeatable, default: throughput and lead time)')
+    parser.add_argument('--max-replications', type=int, default=200,
+                        help='Upper limit with --precision (batches with --batch-means)')
+    parser.add_argument('--batch-means', action='store_true',
+                        help='With --precision, extend one long run by batches instead of adding seeds')
+    parser.add_argument('--batch-hours', type=float, default=None,
+                        help='Batch length for --batch-means (default: a tenth of the duration)')
+    options = parser.parse_args(args)
+    if options.batch_means and options.precision is None:
+        parser.error('--batch-means needs --precision')
+    
+    print("=== Factory Simulation - Replications ===")
+    config = load_config(options.config)
+    
+    if options.precision is None:
+        replication_results = replicate(config, options.replications, options.workers, options.confidence,
+                                        options.antithetic)
+    else:
+        from experiments.sequential import DEFAULT_PRECISION_KPIS, batch_means_until, replicate_until
+        kpis = options.kpi or DEFAULT_PRECISION_KPIS
+        if options.batch_means:
+            replication_results = batch_means_until(config, options.precision, kpis, options.confidence,
+                                                    options.batch_hours, options.max_replications)
+        else:
+            replication_results = replicate_until(config, options.precision, kpis, options.confidence,
+                                                  options.max_replications, options.workers, options.antithetic)
+        status = 'reached' if replication_results['converged'] else 'NOT reached'
+        print(f"Precision {options.precision:.1%} {status} after {replication_results['replications']} samples")
+    generate_replication_report(replication_results, config)
+    
+    for name, stats in replication_results['summary'].items():
+        if stats['n'] > 1:
+            print(f"{name}: {stats['mean']:.4f} +/- {stats['half_width']:.4f}")
+
+def sweep_command(args):
+    """Run a parameter sweep defined in a YAML file"""
+    from experiments.sweep import ParameterSweep
+    
+    parser = argparse.ArgumentParser(prog='main.py sweep',
+                                     description='Run a grid / random / Latin hypercube parameter sweep')
+    parser.add_argument('spec', help='Path to sweep definition YAML')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('-o', '--output', default='results/sweep', help='Output directory (resumes if it exists)')
+    options = parser.parse_args(args)
+    
+    print("=== Factory Simulation - Parameter Sweep ===")
+    with open(options.spec, 'r') as file:
+        spec = yaml.safe_load(file)
+    
+    # The base config path is relative to the sweep file
+    base_config_path = os.path.join(os.path.dirname(options.spec), spec.get('base_config', 'config.yaml'))
+    config = load_config(base_config_path)
+    
+    sweep = ParameterSweep.from_spec(spec, config, options.output)
+    sweep.run(options.workers)
+    
+    print(f"Sweep results saved to {sweep.table_path}")
+
+def optimize_command(args):
+    """Search the modifiable parameters for high throughput and low lead time"""
+    from experiments.optimizer import SuccessiveHalvingOptimizer, save_optimization_results
+    
+    parser = argparse.ArgumentParser(prog='main.py optimize',
+                                     description='Successive halving search over config parameters')
+    parser.add_argument('config', nargs='?', default='../config.yaml', help='Path to YAML config')
+    parser.add_argument('--space', default=None, help='YAML file with a "parameters" search space')
+    parser.add_argument('--candidates', type=int, default=27, help='Number of initial candidates')
+    parser.add_argument('--eta', type=int, default=3, help='Keep 1/eta of the candidates after each rung')
+    parser.add_argument('--rungs', type=int, default=3, help='Number of successive halving rungs')
+    parser.add_argument('--seeds', type=int, default=5, help='Seeds per candidate in the final rung')
+    parser.add_argument('--screen', type=int, default=1,
+                        help='Sample this many times the candidates and simulate only the best by analytical estimate')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('-o', '--output', default='results/optimization', help='Output directory')
+    options = parser.parse_args(args)
+    
+    print("=== Factory Simulation - Configuration Optimizer ===")
+    config = load_config(options.config)
+    
+    search_space = None
+    if options.space:
+        with open(options.space, 'r') as file:
+            search_space = yaml.safe_load(file)['parameters']
+    
+    optimizer = SuccessiveHalvingOptimizer(config, search_space, candidates=options.candidates,
+                                           eta=options.eta, rungs=options.rungs, seeds=options.seeds,
+                                           screen=options.screen)
+    results = optimizer.run(options.workers)
+    save_optimization_results(results, config, options.output)
+    
+    print(f"\nBest candidate: {results['best_candidate']}")
+    for path, value in results['best_parameters'].items():
+        print(f"  {path}: {value}")
+    for name, value in results['best_kpis'].items():
+        print(f"  {name}: {value:.3f}")
+    if results['screened_candidates']:
+        print(f"Screened {results['screened_candidates']} sampled candidates analytically")
+    print(f"Simulated {results['simulated_hours']:.0f}h "
+          f"(exhaustive search: {results['exhaustive_simulated_hours']:.0f}h)")
+    print(f"Best configuration saved to {options.output}/config_best.yaml")
+
+def benchmark_command(args):
+    """Measure engine speed and memory on standard scenarios and check for regressions"""
+    from experiments.benchmark import (SCENARIOS, DEFAULT_BASELINE_PATH, DEFAULT_TOLERANCE, build_scenarios,
+                                       run_benchmarks, measure_startup, compare_to_baseline, load_baseline,
+                                       save_baseline)
+    
+    parser = argparse.ArgumentParser(prog='main.py benchmark',
+                                     description='Benchmark the simulator against a stored baseline')
+    parser.add_argument('scenarios', nargs='*',
+                        help=f'Scenarios to run (default: all of {", ".join(SCENARIOS)}, and startup)')
+    parser.add_argument('--config-dir', default=str(current_dir.parent), help='Directory with the config files')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario (the fastest is kept)')
+    parser.add_argument('--no-report', action='store_true', help='Skip the reporting phase')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative slowdown / memory growth before failing')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline')
+    options = parser.parse_args(args)
+    
+    print("=== Factory Simulation - Benchmark ===")
+    configs = {config_file: load_config(os.path.join(options.config_dir, config_file))
+               for config_file in {config_file for config_file, _ in SCENARIOS.values()}}
+    names = [name for name in options.scenarios if name != 'startup']
+    scenarios = build_scenarios(configs, names or None) if names or not options.scenarios else {}
+    
+    def progress(name, metrics):
+        print(f"{name:<14} {metrics['events']:>10,d} events  {metrics['events_per_second']:>10,.0f} events/s  "
+              f"{metrics['orders_per_cpu_second']:>7,.0f} orders/CPU-s  "
+              f"simulate {metrics['simulate_seconds']:7.2f}s  report {metrics['report_seconds']:6.2f}s  "
+              f"peak RSS {metrics['simulate_peak_rss_mb']:6.1f} / {metrics['peak_rss_mb']:6.1f} MB")
+    
+    results = run_benchmarks(scenarios, options.repeat, not options.no_report, progress)
+    if not options.scenarios or 'startup' in options.scenarios:
+        results['startup'] = measure_startup(options.repeat)
+        heavy = ', '.join(results['startup']['heavy_modules']) or 'none'
+        print(f"{'startup':<14} headless startup {results['startup']['startup_seconds']:.3f}s  "
+              f"heavy imports: {heavy}")
+    
+    if options.update_baseline:
+        save_baseline(results, options.baseline)
+        print(f"Baseline saved to {options.baseline}")
+        return
+    
+    baseline = load_baseline(options.baseline)
+    if baseline is None:
+        print(f"No baseline at {options.baseline}; run with --update-baseline to create one")
+        return
+    
+    regressions = compare_to_baseline(results, baseline, options.tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS (tolerance {options.tolerance:.0%}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions against {options.baseline} (tolerance {options.tolerance:.0%})")
+
+COMMANDS = {
+    'simulate': simulate_command,
+    'approximate': approximate_command,
+    'report': report_command,
+    'replicate': replicate_command,
+    'sweep': sweep_command,
+    'optimize': optimize_command,
+    'benchmark': benchmark_command
+}
+
 def main():
     """Main function"""
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+    
     print("=== Factory Production & Logistics Simulation ===")
     
     # Load configuration
     config = load_config()
     
-    # Create and run simulation
-    factory = FactorySimulation(config)
-    results = factory.run()
+    # Reuse a cached run of this exact config and code, else simulate
+    cache = ResultCache.from_config(config)
+    cached_data = cache.get_data(config) if cache is not None else None
+    if cached_data is not None:
+        from analysis.storage import load_results
+        print(f"Using cached run from {cached_data}")
+        results, _ = load_results(cached_data)
+    else:
+        factory = FactorySimulation(config)
+        results = factory.run()
     
     # Generate report
     print("\nGenerating analysis report...")
+    from analysis.reporting import generate_report
     generate_report(results, config)
+    if cache is not None and cached_data is None and not results.streaming:
+        cache.put(config, results.kpis, results)
     
     print("\nSimulation completed successfully!")
     print("Check 'results/' directory for output files.")
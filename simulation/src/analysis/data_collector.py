@@ -2,139 +2,151 @@
 Data Collector - Collects simulation events and metrics
 """
 
-import pandas as pd
-from typing import Dict, List, Any
-from collections import defaultdict
+import numpy as np
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Union
+from analysis.event_store import EventStore, MetricStore
+from analysis.kpi_engine import KpiResult, compute_kpis
+from analysis.results import SimulationResults
+from analysis.spill import CHUNK_EVENTS, SpillWriter, SpillingEventStore, SpillingMetricStore
+from analysis.streaming import StreamingKpis, TimeWeightedAverage
+
+if TYPE_CHECKING:
+    import pandas as pd  # Loaded by the event store only when a DataFrame is requested
 
 class DataCollector:
     """Collects and stores simulation data for analysis"""
     
-    def __init__(self):
-        self.events = []
-        self.metrics = defaultdict(list)
+    def __init__(self, streaming: bool = False, warmup: Union[float, str] = 0.0,
+                 spill_dir: Optional[str] = None, chunk_events: int = CHUNK_EVENTS):
+        # Columnar, per-event-type storage instead of one dict per event; with
+        # spill_dir it is written there in chunks during the run instead of kept
+        if spill_dir is not None:
+            self.spill = SpillWriter(spill_dir)
+            self.events = SpillingEventStore(self.spill, chunk_events)
+            self.metrics = SpillingMetricStore(self.spill, chunk_events)
+        else:
+            self.spill = None
+            self.events = EventStore()
+            self.metrics = MetricStore()
+        
+        # Time-weighted level of every tracked store/container, integrated as it changes
+        self.levels = {}
+        self.end_time = None
+        
+        # Servers per machine (utilization is busy time / (servers x duration))
+        self.machine_servers = {}
+        
+        # Hours at the start excluded from the KPIs ('auto': detected from the completions)
+        self.warmup = warmup
         
+        # Streaming mode keeps only running KPI statistics, not the event log
+        self.streaming = StreamingKpis(warmup) if streaming else None
+    
+    def register_machine(self, name: str, servers: int = 1):
+        """Declare a machine and how many items it can process at once"""
+        self.machine_servers[name] = servers
+    
     def record_event(self, event_type: str, data: Dict[str, Any]):
         """Record a simulation event"""
-        event = {
-            'event_type': event_type,
-            'timestamp': data.get('time', 0),
-            **data
-        }
-        self.events.append(event)
+        if self.streaming is not None:
+            self.streaming.record_event(event_type, data)
+        else:
+            self.events.append(event_type, data)
     
     def record_metric(self, metric_name: str, value: float, timestamp: float):
-        """Record a metric value at a specific time"""
-        self.metrics[metric_name].append({
-            'timestamp': timestamp,
-            'value': value
-        })
+        """Record a metric value at a specific time (streaming mode keeps no samples)"""
+        if self.streaming is None:
+            self.metrics.append(metric_name, value, timestamp)
+    
+    def record_level(self, name: str, level: float, timestamp: float):
+        """Record a change in a buffer or inventory level"""
+        if self.streaming is not None:
+            self.streaming.record_level(name, level, timestamp)
+            return
+        # Only changes are stored; the area under the level is integrated as it goes
+        self.metrics.append_change(name, level, timestamp)
+        tracker = self.levels.get(name)
+        if tracker is None:
+            tracker = self.levels[name] = TimeWeightedAverage()
+        tracker.update(level, timestamp)
     
-    def get_events_df(self) -> pd.DataFrame:
+    def finalize(self, end_time: float):
+        """Mark the end of the run, up to which levels are time-averaged"""
+        self.end_time = end_time
+        if self.streaming is not None:
+            self.streaming.end_time = end_time
+        if self.spill is not None:
+            # Everything recorded so far goes to disk and is read back memory-mapped
+            self.spill.sync(self.events, self.metrics)
+    
+    def close(self):
+        """Stop the spill writer thread (the spilled files stay readable)"""
+        if self.spill is not None:
+            self.spill.close()
+    
+    def close_batch(self) -> Dict[str, float]:
+        """
+        KPIs of the batch since the previous call (streaming mode only), then
+        start the next batch at the end of the run so far.
+        """
+        if self.streaming is None:
+            raise ValueError("Batches need streaming KPIs")
+        kpis = self.calculate_kpis()
+        kpis.pop('warmup_hours', None)  # The batch start, not a warm-up
+        self.streaming = self.streaming.next_batch(self.end_time)
+        return kpis
+    
+    def get_events_df(self) -> 'pd.DataFrame':
         """Get events as pandas DataFrame"""
-        if not self.events:
-            return pd.DataFrame()
-        return pd.DataFrame(self.events)
+        return self.events.to_frame()
+    
+    def get_event_table(self, event_type: str) -> 'pd.DataFrame':
+        """Get events of one type as a DataFrame built on views of the stored columns"""
+        return self.events.table(event_type)
     
-    def get_metrics_df(self, metric_name: str) -> pd.DataFrame:
+    def get_metrics_df(self, metric_name: str) -> 'pd.DataFrame':
         """Get specific metric as pandas DataFrame"""
         if metric_name not in self.metrics:
+            import pandas as pd
             return pd.DataFrame()
-        return pd.DataFrame(self.metrics[metric_name])
+        return self.metrics[metric_name].to_frame()
     
-    def get_results(self) -> Dict[str, Any]:
-        """Get all collected data"""
-        return {
-            'events': self.events,
-            'metrics': dict(self.metrics),
-            'events_df': self.get_events_df()
-        }
+    def get_results(self) -> SimulationResults:
+        """Get all collected data, with the derived views (DataFrame, KPIs, ...) built on demand"""
+        return SimulationResults(self)
+    
+    def compute_kpi_result(self) -> KpiResult:
+        """Calculate KPIs together with the per-order lead times behind them"""
+        if self.streaming is not None:
+            # O(1): read off the running statistics (no per-order lead times are kept)
+            return KpiResult(self.streaming.kpis(self.machine_servers), np.empty(0),
+                             self.streaming.duration - self.streaming.warmup)
+        # Levels without a live tracker (e.g. data loaded from disk) are integrated from the metrics
+        return compute_kpis(self.events, self.metrics, self.levels, self.end_time, self.machine_servers,
+                            self.warmup)
     
     def calculate_kpis(self) -> Dict[str, float]:
         """Calculate Key Performance Indicators"""
-        df = self.get_events_df()
-        
-        if df.empty:
-            return {}
-        
-        kpis = {}
-        
-        # Order-related KPIs
-        order_arrivals = df[df['event_type'] == 'order_arrival']
-        order_completions = df[df['event_type'] == 'order_completed']
-        
-        if not order_arrivals.empty and not order_completions.empty:
-            # Throughput (orders per hour)
-            simulation_duration = df['timestamp'].max()
-            kpis['throughput_orders_per_hour'] = len(order_completions) / simulation_duration
-            
-            # Lead time calculation (for completed orders)
-            lead_times = []
-            for _, completion in order_completions.iterrows():
-                order_id = completion['order_id']
-                arrival = order_arrivals[order_arrivals['order_id'] == order_id]
-                if not arrival.empty:
-                    lead_time = completion['timestamp'] - arrival.iloc[0]['timestamp']
-                    lead_times.append(lead_time)
-            
-            if lead_times:
-                kpis['average_lead_time_hours'] = sum(lead_times) / len(lead_times)
-                kpis['max_lead_time_hours'] = max(lead_times)
-                kpis['min_lead_time_hours'] = min(lead_times)
-        
-        # Machine utilization
-        machine_events = df[df['event_type'] == 'machine_processing']
-        if not machine_events.empty:
-            for machine_name in machine_events['machine'].unique():
-                machine_data = machine_events[machine_events['machine'] == machine_name]
-                total_processing_time = machine_data['processing_time'].sum()
-                simulation_duration = df['timestamp'].max()
-                utilization = total_processing_time / simulation_duration
-                kpis[f'{machine_name.lower().replace(" ", "_")}_utilization'] = utilization
-        
-        # Logistics KPIs
-        departures = df[df['event_type'] == 'lorry_departure']
-        if not departures.empty:
-            kpis['total_shipments'] = len(departures)
-            kpis['total_products_shipped'] = departures['products_shipped'].sum()
-            kpis['average_products_per_shipment'] = departures['products_shipped'].mean()
-            
-            # Delay analysis
-            delays = departures[departures['delay_time'] > 0]
-            kpis['delay_rate'] = len(delays) / len(departures)
-            if not delays.empty:
-                kpis['average_delay_time_hours'] = delays['delay_time'].mean()
-        
-        # Warehouse KPIs
-        warehouse_gets = df[df['event_type'] == 'warehouse_get']
-        if not warehouse_gets.empty:
-            kpis['average_warehouse_wait_time'] = warehouse_gets['wait_time'].mean()
-        
-        # Average inventory level
-        if 'warehouse_level' in self.metrics:
-            inv_df = self.get_metrics_df('warehouse_level')
-            kpis['average_warehouse_inventory'] = inv_df['value'].mean()
-            
-        # Buffer utilization
-        for m_name in self.metrics:
-            if m_name.startswith('buffer_'):
-                buf_df = self.get_metrics_df(m_name)
-                kpis[f'average_{m_name}_level'] = buf_df['value'].mean()
-                kpis[f'max_{m_name}_level'] = buf_df['value'].max()
-
-        return kpis
+        return self.compute_kpi_result().kpis
     
-    def get_summary_stats(self) -> Dict[str, Any]:
-        """Get summary statistics"""
-        df = self.get_events_df()
+    def get_summary_stats(self, kpis: Dict[str, float] = None) -> Dict[str, Any]:
+        """Get summary statistics (pass the KPIs if they are already computed)"""
+        if self.streaming is not None:
+            counts = self.streaming.event_counts
+            duration = self.streaming.duration
+        else:
+            # Counted from the event store, without building a DataFrame
+            tables = self.events.tables
+            counts = {event_type: table.size for event_type, table in tables.items()}
+            duration = max((table.timestamp[:table.size].max() for table in tables.values() if table.size),
+                           default=0.0)
         
-        if df.empty:
+        if not counts:
             return {'total_events': 0}
         
-        stats = {
-            'total_events': len(df),
-            'simulation_duration': df['timestamp'].max(),
-            'event_types': df['event_type'].value_counts().to_dict(),
-            'kpis': self.calculate_kpis()
+        return {
+            'total_events': sum(counts.values()),
+            'simulation_duration': duration,
+            'event_types': dict(sorted(counts.items(), key=lambda item: -item[1])),
+            'kpis': kpis if kpis is not None else self.calculate_kpis()
         }
-        
-        return stats
\ No newline at end of file
@@ -0,0 +1,391 @@
+"""
+Event Store - Typed, columnar storage for simulation events and metrics
+"""
+
+import os
+import json
+import numpy as np
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List
+
+if TYPE_CHECKING:
+    import pandas as pd  # Imported where a DataFrame is built, so KPI-only runs never load pandas
+
+INITIAL_CAPACITY = 1024
+
+# Array dtypes of the column kinds inferred from the first event of a type
+_KIND_DTYPES = {
+    'bool': np.bool_,
+    'int': np.int64,
+    'float': np.float64,
+    'str': np.int32,  # Codes into the store's string pool
+}
+
+def _infer_kind(value: Any) -> str:
+    """Column kind for a Python value"""
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool'
+    if isinstance(value, (int, np.integer)):
+        return 'int'
+    if isinstance(value, (float, np.floating)):
+        return 'float'
+    if isinstance(value, str):
+        return 'str'
+    return 'object'
+
+class StringPool:
+    """Interns repeated strings (e.g. machine names) as small integer codes"""
+    
+    def __init__(self):
+        self.codes = {}
+        self.strings = []
+    
+    def intern(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.codes[value] = code
+            self.strings.append(value)
+        return code
+
+class EventTable:
+    """
+    All events of one type, one preallocated array per field.
+    
+    The schema is inferred from the first event. Columns share a capacity that
+    doubles when full, so appending is amortized O(1) and the used part of each
+    column is exposed without copying. A field whose values stop matching its
+    inferred type (or that is missing or new) falls back to a Python list column.
+    """
+    
+    def __init__(self, event_type: str, strings: StringPool, first_event: Dict[str, Any],
+                 capacity: int = INITIAL_CAPACITY):
+        self.event_type = event_type
+        self.strings = strings
+        self.has_time = 'time' in first_event  # 'time' is stored once, as the timestamp
+        self.size = 0
+        self.capacity = capacity
+        self.seq = np.empty(capacity, dtype=np.int64)  # Global recording order
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        self.fields = []  # [name, kind, column] in first-seen order
+        self.field_position = {}
+        self.time_position = list(first_event).index('time') if self.has_time else None
+        for name, value in first_event.items():
+            if not (name == 'time' and self.has_time):
+                self._add_field(name, _infer_kind(value))
+    
+    def empty_like(self, capacity: int = INITIAL_CAPACITY) -> 'EventTable':
+        """Empty table with the same fields and column kinds"""
+        table = EventTable.__new__(EventTable)
+        table.event_type = self.event_type
+        table.strings = self.strings
+        table.has_time = self.has_time
+        table.time_position = self.time_position
+        table.size = 0
+        table.capacity = capacity
+        table.seq = np.empty(capacity, dtype=np.int64)
+        table.timestamp = np.empty(capacity, dtype=np.float64)
+        table.fields = []
+        table.field_position = {}
+        for name, kind, _ in self.fields:
+            table._add_field(name, kind)
+        return table
+    
+    def _add_field(self, name: str, kind: str):
+        """Add a column; rows recorded before it existed are None"""
+        if kind == 'object':
+            column = [None] * self.capacity
+        else:
+            column = np.empty(self.capacity, dtype=_KIND_DTYPES[kind])
+        self.field_position[name] = len(self.fields)
+        self.fields.append([name, kind, column])
+    
+    def _decode(self, kind: str, value: Any) -> Any:
+        if kind == 'str':
+            return self.strings.strings[value]
+        if kind == 'object':
+            return value
+        return value.item()
+    
+    def _to_object(self, field: list):
+        """Convert a typed column to a Python list column"""
+        name, kind, column = field
+        values = [self._decode(kind, column[i]) for i in range(self.size)]
+        field[1] = 'object'
+        field[2] = values + [None] * (self.capacity - self.size)
+    
+    def _grow(self):
+        """Double the capacity of every column"""
+        capacity = self.capacity * 2
+        self.seq = np.resize(self.seq, capacity)
+        self.timestamp = np.resize(self.timestamp, capacity)
+        for field in self.fields:
+            if field[1] == 'object':
+                field[2].extend([None] * (capacity - self.capacity))
+            else:
+                field[2] = np.resize(field[2], capacity)
+        self.capacity = capacity
+    
+    def append(self, seq: int, timestamp: float, data: Dict[str, Any]):
+        """Append one event"""
+        i = self.size
+        if i == self.capacity:
+            self._grow()
+        self.seq[i] = seq
+        self.timestamp[i] = timestamp
+        
+        if len(data) - self.has_time != len(self.fields):
+            self._add_new_fields(data)
+        
+        for field in self.fields:
+            name, kind, column = field
+            value = data.get(name)
+            if kind == 'str':
+                if type(value) is str:
+                    column[i] = self.strings.intern(value)
+                    continue
+            elif kind == 'object':
+                column[i] = value
+                continue
+            else:
+                value_kind = _infer_kind(value)
+                if value_kind == kind or (kind == 'float' and value_kind == 'int'):
+                    column[i] = value
+                    continue
+            self._to_object(field)
+            field[2][i] = value
+        self.size = i + 1
+    
+    def _add_new_fields(self, data: Dict[str, Any]):
+        """Add object columns for fields the first event did not have"""
+        for name in data:
+            if name not in self.field_position and not (name == 'time' and self.has_time):
+                self._add_field(name, 'object')
+    
+    def names(self) -> list:
+        """Payload field names in first-seen order"""
+        names = [field[0] for field in self.fields]
+        if self.has_time:
+            names.insert(self.time_position, 'time')
+        return names
+    
+    def column(self, name: str) -> Any:
+        """Used part of a column: a view for array columns, a Categorical for strings"""
+        if name == 'timestamp' or (name == 'time' and self.has_time):
+            return self.timestamp[:self.size]
+        if name not in self.field_position:
+            raise KeyError(f"Event type '{self.event_type}' has no field '{name}'")
+        _, kind, column = self.fields[self.field_position[name]]
+        if kind == 'str':
+            import pandas as pd
+            return pd.Categorical.from_codes(column[:self.size], categories=self.strings.strings)
+        return column[:self.size]
+    
+    def to_frame(self) -> 'pd.DataFrame':
+        """DataFrame of this event type built on views of the columns"""
+        import pandas as pd
+        columns = {'event_type': self.event_type,
+                   'timestamp': self.timestamp[:self.size]}
+        for name in self.names():
+            columns[name] = self.column(name)
+        return pd.DataFrame(columns, index=pd.RangeIndex(self.size), copy=False)
+    
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Events as dicts (slow; for code that expects the old list of dicts)"""
+        for i in range(self.size):
+            row = {'event_type': self.event_type, 'timestamp': self.timestamp[i].item()}
+            for name in self.names():
+                if name == 'time' and self.has_time:
+                    row[name] = row['timestamp']
+                else:
+                    _, kind, column = self.fields[self.field_position[name]]
+                    row[name] = self._decode(kind, column[i])
+            yield row
+    
+    def save(self, directory: str) -> Dict[str, Any]:
+        """
+        Write the used part of every column as a .npy file and return the schema.
+        
+        String columns keep their codes (the pool is saved by the store). A
+        Python list column of integer lists, such as the product ids of a
+        shipment, is saved flat with row offsets; any other one as JSON.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, '_seq.npy'), self.seq[:self.size])
+        np.save(os.path.join(directory, '_timestamp.npy'), self.timestamp[:self.size])
+        fields = []
+        for name, kind, column in self.fields:
+            path = os.path.join(directory, name)
+            if kind != 'object':
+                np.save(path + '.npy', column[:self.size])
+            elif all(isinstance(value, (list, tuple)) and all(_infer_kind(item) == 'int' for item in value)
+                     for value in column[:self.size]):
+                kind = 'int_list'
+                lengths = np.fromiter((len(value) for value in column[:self.size]), dtype=np.int64, count=self.size)
+                offsets = np.concatenate(([0], np.cumsum(lengths)))
+                np.save(path + '.offsets.npy', offsets)
+                np.save(path + '.npy', np.fromiter((item for value in column[:self.size] for item in value),
+                                                   dtype=np.int64, count=offsets[-1]))
+            else:
+                with open(path + '.json', 'w') as f:
+                    json.dump(column[:self.size], f, default=str)
+            fields.append([name, kind])
+        return {'size': self.size, 'time_position': self.time_position, 'fields': fields}
+    
+    @classmethod
+    def load(cls, directory: str, event_type: str, strings: StringPool, schema: Dict[str, Any],
+             mmap: bool = True) -> 'EventTable':
+        """Table written by save(); array columns are memory-mapped read-only views of the files"""
+        mode = 'r' if mmap else None
+        table = cls.__new__(cls)
+        table.event_type = event_type
+        table.strings = strings
+        table.time_position = schema['time_position']
+        table.has_time = table.time_position is not None
+        table.size = table.capacity = schema['size']  # Full, so an append copies before writing
+        table.seq = np.load(os.path.join(directory, '_seq.npy'), mmap_mode=mode)
+        table.timestamp = np.load(os.path.join(directory, '_timestamp.npy'), mmap_mode=mode)
+        table.fields = []
+        table.field_position = {}
+        for name, kind in schema['fields']:
+            path = os.path.join(directory, name)
+            if kind == 'int_list':
+                offsets = np.load(path + '.offsets.npy')
+                values = np.load(path + '.npy').tolist()
+                kind, column = 'object', [values[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+            elif kind == 'object':
+                with open(path + '.json', 'r') as f:
+                    column = json.load(f)
+            else:
+                column = np.load(path + '.npy', mmap_mode=mode)
+            table.field_position[name] = len(table.fields)
+            table.fields.append([name, kind, column])
+        return table
+
+class EventStore:
+    """Per-event-type columnar tables sharing one string pool and insertion counter"""
+    
+    def __init__(self):
+        self.tables = {}
+        self.strings = StringPool()
+        self.count = 0
+    
+    def append(self, event_type: str, data: Dict[str, Any]):
+        """Record one event; 'time' in the payload becomes its timestamp"""
+        table = self.tables.get(event_type)
+        if table is None:
+            table = EventTable(event_type, self.strings, data)
+            self.tables[event_type] = table
+        table.append(self.count, data.get('time', 0), data)
+        self.count += 1
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Events as dicts in recording order (slow compatibility path)"""
+        rows = [(row_seq, row) for table in self.tables.values()
+                for row_seq, row in zip(table.seq[:table.size], table.rows())]
+        rows.sort(key=lambda item: item[0])
+        return (row for _, row in rows)
+    
+    def table(self, event_type: str) -> 'pd.DataFrame':
+        """DataFrame of a single event type (empty if none were recorded)"""
+        if event_type not in self.tables:
+            import pandas as pd
+            return pd.DataFrame()
+        return self.tables[event_type].to_frame()
+    
+    def to_frame(self) -> 'pd.DataFrame':
+        """All events in recording order as one wide DataFrame"""
+        import pandas as pd
+        if not self.count:
+            return pd.DataFrame()
+        frames = [table.to_frame() for table in self.tables.values()]
+        order = np.argsort(np.concatenate([table.seq[:table.size] for table in self.tables.values()]),
+                           kind='stable')
+        df = pd.concat(frames, ignore_index=True)
+        return df.iloc[order].reset_index(drop=True)
+    
+    def save(self, directory: str) -> Dict[str, Any]:
+        """Write every table under directory/<event type>/ and return the schema of the store"""
+        return {
+            'count': self.count,
+            'strings': self.strings.strings,
+            'tables': {event_type: table.save(os.path.join(directory, event_type))
+                       for event_type, table in self.tables.items()}
+        }
+    
+    @classmethod
+    def load(cls, directory: str, schema: Dict[str, Any], mmap: bool = True) -> 'EventStore':
+        """Store written by save()"""
+        store = cls()
+        store.count = schema['count']
+        for string in schema['strings']:
+            store.strings.intern(string)
+        for event_type, table_schema in schema['tables'].items():
+            store.tables[event_type] = EventTable.load(os.path.join(directory, event_type), event_type,
+                                                       store.strings, table_schema, mmap)
+        return store
+
+class MetricSeries:
+    """(timestamp, value) samples of one metric in doubling float64 arrays"""
+    
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.size = 0
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        self.value = np.empty(capacity, dtype=np.float64)
+    
+    def append(self, value: float, timestamp: float):
+        i = self.size
+        if i == len(self.value):
+            self.timestamp = np.resize(self.timestamp, 2 * i)
+            self.value = np.resize(self.value, 2 * i)
+        self.timestamp[i] = timestamp
+        self.value[i] = value
+        self.size = i + 1
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def to_frame(self) -> 'pd.DataFrame':
+        import pandas as pd
+        return pd.DataFrame({'timestamp': self.timestamp[:self.size],
+                             'value': self.value[:self.size]}, copy=False)
+
+class MetricStore(dict):
+    """Metric name -> MetricSeries"""
+    
+    def save(self, directory: str) -> List[str]:
+        """Write <name>.timestamp.npy and <name>.value.npy per metric; returns the names"""
+        os.makedirs(directory, exist_ok=True)
+        for name, series in self.items():
+            np.save(os.path.join(directory, f'{name}.timestamp.npy'), series.timestamp[:series.size])
+            np.save(os.path.join(directory, f'{name}.value.npy'), series.value[:series.size])
+        return list(self)
+    
+    @classmethod
+    def load(cls, directory: str, names: List[str], mmap: bool = True) -> 'MetricStore':
+        """Store written by save(), memory-mapped unless mmap is False"""
+        mode = 'r' if mmap else None
+        store = cls()
+        for name in names:
+            series = store[name] = MetricSeries(0)
+            series.timestamp = np.load(os.path.join(directory, f'{name}.timestamp.npy'), mmap_mode=mode)
+            series.value = np.load(os.path.join(directory, f'{name}.value.npy'), mmap_mode=mode)
+            series.size = len(series.value)
+        return store
+    
+    def append(self, metric_name: str, value: float, timestamp: float):
+        series = self.get(metric_name)
+        if series is None:
+            series = self[metric_name] = MetricSeries()
+        series.append(value, timestamp)
+    
+    def append_change(self, metric_name: str, value: float, timestamp: float):
+        """Append a level change; a second change at the same instant replaces the first"""
+        series = self.get(metric_name)
+        if series is not None and series.size and series.timestamp[series.size - 1] == timestamp:
+            # Zero-duration states add no area, so keep one sample per instant
+            series.value[series.size - 1] = value
+        else:
+            self.append(metric_name, value, timestamp)
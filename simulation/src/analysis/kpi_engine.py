@@ -0,0 +1,159 @@
+"""
+KPI Engine - Vectorized KPI computation over the columnar event store
+"""
+
+import numpy as np
+from typing import Dict, Any, Union
+from analysis.streaming import LEAD_TIME_QUANTILES, TimeWeightedAverage, level_kpis
+from analysis.warmup import detect_warmup
+
+def _join_orders(arrival_ids: np.ndarray, completion_ids: np.ndarray) -> tuple:
+    """Completions whose arrival was recorded (mask) and the index of that arrival"""
+    keys, first = np.unique(arrival_ids, return_index=True)
+    positions = np.searchsorted(keys, completion_ids)
+    positions[positions == len(keys)] = 0
+    matched = keys[positions] == completion_ids
+    return matched, first[positions[matched]]
+
+def order_lead_times(arrival_ids: np.ndarray, arrival_times: np.ndarray,
+                     completion_ids: np.ndarray, completion_times: np.ndarray) -> np.ndarray:
+    """
+    Lead time of every completion whose order arrival was recorded.
+    
+    Arrivals are joined to completions on order_id with a sorted-key lookup
+    (first arrival wins for duplicate ids), so this is O(n log n).
+    """
+    arrival_ids = np.asarray(arrival_ids)
+    completion_ids = np.asarray(completion_ids)
+    if len(arrival_ids) == 0 or len(completion_ids) == 0:
+        return np.empty(0)
+    
+    matched, arrival_index = _join_orders(arrival_ids, completion_ids)
+    return np.asarray(completion_times)[matched] - np.asarray(arrival_times)[arrival_index]
+
+def _auto_warmup(arrivals, completions) -> float:
+    """MSER-5 warm-up of the lead times in completion order"""
+    if arrivals is None or completions is None:
+        return 0.0
+    matched, arrival_index = _join_orders(arrivals.column('order_id'), completions.column('order_id'))
+    completion_times = completions.column('timestamp')[matched]
+    return detect_warmup(completion_times, completion_times - arrivals.column('timestamp')[arrival_index])
+
+def _group_codes(table, name: str) -> tuple:
+    """Integer group codes and group names of a column, groups in order of appearance"""
+    _, kind, column = table.fields[table.field_position[name]]
+    if kind == 'str':
+        codes, names = column[:table.size], table.strings.strings
+    else:
+        names, codes = np.unique(np.asarray(column[:table.size], dtype=str), return_inverse=True)
+    
+    present, first = np.unique(codes, return_index=True)
+    order = present[np.argsort(first)]
+    return codes, [names[code] for code in order], order
+
+class KpiResult:
+    """KPIs of one run plus the per-order lead times they were computed from"""
+    
+    def __init__(self, kpis: Dict[str, float], lead_times: np.ndarray, duration: float):
+        self.kpis = kpis
+        self.lead_times = lead_times
+        self.duration = duration
+
+def compute_kpis(events, metrics, levels: Dict[str, Any] = None, end_time: float = None,
+                 machine_servers: Dict[str, int] = None, warmup: Union[float, str] = 0.0) -> KpiResult:
+    """
+    Compute every KPI in one pass over the per-event-type tables.
+    
+    Levels are TimeWeightedAverage trackers by name; for every level without
+    one, the changes stored in metrics are integrated here. Machines missing from
+    machine_servers are taken to process one item at a time.
+    
+    With a warm-up (hours, or 'auto' for MSER-5 on the completion stream) only
+    data from the end of the warm-up on is used: orders arriving after it,
+    processing started after it, and levels averaged from it.
+    """
+    tables = events.tables
+    if not events.count:
+        return KpiResult({}, np.empty(0), 0.0)
+    
+    simulation_duration = max(table.timestamp[:table.size].max() for table in tables.values())
+    kpis = {}
+    lead_times = np.empty(0)
+    
+    arrivals = tables.get('order_arrival')
+    completions = tables.get('order_completed')
+    if warmup == 'auto':
+        warmup = _auto_warmup(arrivals, completions)
+    observed = simulation_duration - warmup
+    
+    def after_warmup(table, time_column: str = 'timestamp') -> np.ndarray:
+        """Rows of a table at or after the end of the warm-up"""
+        return table.column(time_column) >= warmup
+    
+    # Order-related KPIs
+    if arrivals is not None and completions is not None:
+        arrived = after_warmup(arrivals)
+        completed = after_warmup(completions)
+        
+        # Throughput (orders per hour)
+        kpis['throughput_orders_per_hour'] = np.count_nonzero(completed) / observed
+        
+        # Lead time (for completed orders)
+        lead_times = order_lead_times(arrivals.column('order_id')[arrived], arrivals.column('timestamp')[arrived],
+                                      completions.column('order_id')[completed],
+                                      completions.column('timestamp')[completed])
+        if len(lead_times):
+            kpis['average_lead_time_hours'] = lead_times.mean()
+            kpis['max_lead_time_hours'] = lead_times.max()
+            kpis['min_lead_time_hours'] = lead_times.min()
+            for p in LEAD_TIME_QUANTILES:
+                kpis[f'p{p * 100:.0f}_lead_time_hours'] = np.quantile(lead_times, p)
+    
+    # Machine utilization (busy time summed per machine, per server)
+    processing = tables.get('machine_processing')
+    if processing is not None:
+        machine_servers = machine_servers or {}
+        codes, names, order = _group_codes(processing, 'machine')
+        started = after_warmup(processing, 'start_time')
+        busy_time = np.bincount(codes[started], weights=processing.column('processing_time')[started],
+                                minlength=codes.max() + 1)
+        for name, code in zip(names, order):
+            servers = machine_servers.get(name, 1)
+            kpis[f'{name.lower().replace(" ", "_")}_utilization'] = busy_time[code] / (servers * observed)
+    
+    # Logistics KPIs
+    departures = tables.get('lorry_departure')
+    if departures is not None:
+        departed = after_warmup(departures, 'departure_time')
+        products_shipped = departures.column('products_shipped')[departed].astype(float)
+        delay_times = departures.column('delay_time')[departed]
+        if len(products_shipped):
+            kpis['total_shipments'] = len(products_shipped)
+            kpis['total_products_shipped'] = products_shipped.sum()
+            kpis['average_products_per_shipment'] = products_shipped.mean()
+            
+            # Delay analysis
+            delays = delay_times[delay_times > 0]
+            kpis['delay_rate'] = len(delays) / len(products_shipped)
+            if len(delays):
+                kpis['average_delay_time_hours'] = delays.mean()
+    
+    # Warehouse KPIs
+    warehouse_gets = tables.get('warehouse_get')
+    if warehouse_gets is not None:
+        wait_times = warehouse_gets.column('wait_time')[after_warmup(warehouse_gets)]
+        if len(wait_times):
+            kpis['average_warehouse_wait_time'] = wait_times.mean()
+    
+    # Time-weighted buffer and inventory levels; the live trackers cover the whole run, so with a
+    # warm-up, and for any level without one (e.g. data loaded from disk), the stored changes are integrated
+    levels = {} if levels is None or warmup else dict(levels)
+    for name, series in metrics.items():
+        if name not in levels:
+            levels[name] = TimeWeightedAverage.from_changes(series.timestamp[:series.size],
+                                                            series.value[:series.size], warmup or None)
+    kpis.update(level_kpis(levels, end_time if end_time is not None else simulation_duration))
+    if warmup:
+        kpis['warmup_hours'] = warmup
+    
+    return KpiResult(kpis, lead_times, observed)
@@ -2,49 +2,56 @@
 Reporting Module - Generate analysis reports and visualizations
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
+import matplotlib.style
 import os
 from typing import Dict, Any
 import json
 import numpy as np
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+from analysis.event_store import EventTable
+from analysis.results import SimulationResults
+from analysis.storage import save_results
+from components.random_streams import distribution_mean
 
-def generate_report(results: Dict[str, Any], config: Dict[str, Any]):
-    """Generate comprehensive analysis report"""
+PLOT_BINS = 200  # Time buckets of the binned plots, whatever the number of events
+FINAL_DPI = 300
+DRAFT_DPI = 100
+
+def generate_report(results: SimulationResults, config: Dict[str, Any], save_data: bool = True):
+    """Generate comprehensive analysis report (save_data=False skips the binary event log)"""
     
     # Create results directory
     os.makedirs('results', exist_ok=True)
     
-    # Get data
-    events_df = results.get('events_df', pd.DataFrame())
-    
-    if events_df.empty:
+    # KPIs, tables and summary statistics are computed once, inside results
+    if not results.kpis:
         print("No data to analyze!")
         return
     
-    # Calculate KPIs
-    from analysis.data_collector import DataCollector
-    collector = DataCollector()
-    collector.events = results['events']
-    collector.metrics = results['metrics']
-    kpis = collector.calculate_kpis()
-    summary_stats = collector.get_summary_stats()
+    # Streaming runs keep only the KPIs, so there is no event log to plot
+    if results.streaming:
+        generate_text_report(results, config)
+        save_raw_data(results, config, save_data)
+        print("Report generation completed (KPIs only, no event log was kept)!")
+        return
     
     # Generate text report
-    generate_text_report(kpis, summary_stats, config)
+    generate_text_report(results, config)
     
     # Generate visualizations
-    generate_visualizations(events_df, kpis)
+    generate_visualizations(results, draft=config['simulation'].get('draft_plots', False))
     
     # Save raw data
-    save_raw_data(results, kpis, summary_stats)
+    save_raw_data(results, config, save_data)
     
     print("Report generation completed!")
 
-def generate_text_report(kpis: Dict[str, float], summary_stats: Dict[str, Any], 
-                        config: Dict[str, Any]):
+def generate_text_report(results: SimulationResults, config: Dict[str, Any]):
     """Generate text-based analysis report"""
     
+    kpis = results.kpis
     report_lines = []
     report_lines.append("# Factory Simulation Analysis Report")
     report_lines.append("=" * 50)
@@ -53,7 +60,10 @@ def generate_text_report(kpis: Dict[str, float], summary_stats: Dict[str, Any],
     # Configuration summary
     report_lines.append("## Configuration Summary")
     report_lines.append(f"- Simulation Duration: {config['simulation']['duration_hours']} hours")
-    report_lines.append(f"- Order Arrival Rate: {config['order_arrival']['interarrival_time_hours']} hours")
+    interarrival = config['order_arrival']['interarrival_time_hours']
+    if isinstance(interarrival, dict):
+        interarrival = f"{distribution_mean(interarrival):g} ({interarrival.get('distribution', 'exponential')})"
+    report_lines.append(f"- Order Arrival Rate: {interarrival} hours")
     report_lines.append(f"- Warehouse Capacity: {config['parts_warehouse']['capacity']} parts")
     report_lines.append(f"- Lorry Capacity: {config['logistics']['lorry_capacity']} products")
     report_lines.append("")
@@ -84,6 +94,12 @@ def generate_text_report(kpis: Dict[str, float], summary_stats: Dict[str, Any],
     report_lines.append("### Inventory & Buffers")
     if 'average_warehouse_inventory' in kpis:
         report_lines.append(f"- **Avg Warehouse Inventory**: {kpis['average_warehouse_inventory']:.1f} parts")
+    if 'average_pending_orders' in kpis:
+        report_lines.append(f"- **Pending Orders**: Avg: {kpis['average_pending_orders']:.2f}, "
+                            f"Max: {kpis['max_pending_orders']:.0f}")
+    if 'average_finished_storage_level' in kpis:
+        report_lines.append(f"- **Finished Storage**: Avg: {kpis['average_finished_storage_level']:.2f}, "
+                            f"Max: {kpis['max_finished_storage_level']:.0f}")
     
     # Group buffer stats
     buffers = set()
@@ -97,7 +113,7 @@ def generate_text_report(kpis: Dict[str, float], summary_stats: Dict[str, Any],
         buf_name = buf.replace('_', ' ').title()
         report_lines.append(f"- **{buf_name}**: Avg: {avg_val:.2f}, Max: {max_val:.0f}")
     report_lines.append("")
-
+    
     # Logistics performance
     if 'total_shipments' in kpis:
         report_lines.append("### Logistics Performance")
@@ -126,7 +142,7 @@ def generate_text_report(kpis: Dict[str, float], summary_stats: Dict[str, Any],
         
         if max_util_machine[1] > 0.8:
             report_lines.append(f"- **Warning**: {max_util_machine[0].replace('_', ' ').title()} is highly utilized and may be a bottleneck")
-    
+        
         report_lines.append("")
         
         # Recommendations
@@ -146,19 +162,32 @@ def generate_text_report(kpis: Dict[str, float], summary_stats: Dict[str, Any],
     with open('results/analysis_report.md', 'w') as f:
         f.write('\n'.join(report_lines))
 
-def generate_visualizations(events_df: pd.DataFrame, kpis: Dict[str, float]):
-    """Generate visualization plots"""
-    
-    plt.style.use('seaborn-v0_8')
+def _time_edges(end_time: float, bins: int = PLOT_BINS) -> np.ndarray:
+    """Edges of equal time buckets over the run"""
+    return np.linspace(0.0, max(end_time, 1e-9), bins + 1)
+
+def _event_times(table: EventTable) -> np.ndarray:
+    """When the events of a table happened: their 'time', else their first *_time field (e.g. failure_time)"""
+    if not table.has_time:
+        for name in table.names():
+            if name.endswith('_time'):
+                return table.column(name)
+    return table.column('timestamp')
+
+def _analysis_figure(results: SimulationResults, end_time: float) -> Figure:
+    """2x2 overview of arrivals, utilization, lead times and shipments, drawn from binned data"""
+    kpis = results.kpis
+    tables = results.events.tables
     
     # Create figure with subplots
-    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    fig = Figure(figsize=(15, 12))
+    axes = fig.subplots(2, 2)
     fig.suptitle('Factory Simulation Analysis', fontsize=16)
     
     # 1. Order arrivals over time
-    order_arrivals = events_df[events_df['event_type'] == 'order_arrival']
-    if not order_arrivals.empty:
-        axes[0, 0].hist(order_arrivals['timestamp'], bins=20, alpha=0.7, color='blue')
+    if 'order_arrival' in tables:
+        counts, edges = np.histogram(tables['order_arrival'].column('timestamp'), bins=20, range=(0.0, end_time))
+        axes[0, 0].stairs(counts, edges, fill=True, alpha=0.7, color='blue')
         axes[0, 0].set_title('Order Arrivals Over Time')
         axes[0, 0].set_xlabel('Time (hours)')
         axes[0, 0].set_ylabel('Number of Orders')
@@ -177,59 +206,79 @@ def generate_visualizations(events_df: pd.DataFrame, kpis: Dict[str, float]):
             axes[0, 1].text(i, v + 0.01, f'{v:.1%}', ha='center')
     
     # 3. Lead time distribution
-    order_completions = events_df[events_df['event_type'] == 'order_completed']
-    order_arrivals = events_df[events_df['event_type'] == 'order_arrival']
-    
-    if not order_completions.empty and not order_arrivals.empty:
-        lead_times = []
-        for _, completion in order_completions.iterrows():
-            order_id = completion['order_id']
-            arrival = order_arrivals[order_arrivals['order_id'] == order_id]
-            if not arrival.empty:
-                lead_time = completion['timestamp'] - arrival.iloc[0]['timestamp']
-                lead_times.append(lead_time)
-        
-        if lead_times:
-            axes[1, 0].hist(lead_times, bins=15, alpha=0.7, color='orange')
-            axes[1, 0].set_title('Lead Time Distribution')
-            axes[1, 0].set_xlabel('Lead Time (hours)')
-            axes[1, 0].set_ylabel('Frequency')
+    lead_times = results.lead_times
+    if len(lead_times):
+        counts, edges = np.histogram(lead_times, bins=15)
+        axes[1, 0].stairs(counts, edges, fill=True, alpha=0.7, color='orange')
+        axes[1, 0].set_title('Lead Time Distribution')
+        axes[1, 0].set_xlabel('Lead Time (hours)')
+        axes[1, 0].set_ylabel('Frequency')
     
     # 4. Logistics performance
-    departures = events_df[events_df['event_type'] == 'lorry_departure']
-    if not departures.empty:
-        # Products shipped over time
-        cumulative_products = departures['products_shipped'].cumsum()
-        axes[1, 1].plot(departures['departure_time'], cumulative_products, marker='o')
+    departures = tables.get('lorry_departure')
+    if departures is not None and departures.size:
+        # Products shipped over time; beyond PLOT_BINS departures, sampled at the bucket ends
+        times = departures.column('departure_time')
+        cumulative_products = np.cumsum(departures.column('products_shipped'))
+        if len(times) > PLOT_BINS:
+            edges = _time_edges(end_time)
+            shipped = np.searchsorted(times, edges[1:], side='right')
+            cumulative = np.concatenate(([0], cumulative_products))[shipped]
+            axes[1, 1].step(edges[1:], cumulative, where='post')
+        else:
+            axes[1, 1].plot(times, cumulative_products, marker='o')
         axes[1, 1].set_title('Cumulative Products Shipped')
         axes[1, 1].set_xlabel('Time (hours)')
         axes[1, 1].set_ylabel('Total Products Shipped')
     
-    plt.tight_layout()
-    plt.savefig('results/simulation_analysis.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # Additional plot: Timeline of events
-    plt.figure(figsize=(12, 8))
-    
-    event_types = events_df['event_type'].unique()
-    
-    # Use a standard colormap name
-    cmap = plt.get_cmap('Set3')
-    colors = [cmap(i % 12) for i in range(len(event_types))]
-    
-    for i, event_type in enumerate(event_types):
-        event_data = events_df[events_df['event_type'] == event_type]
-        plt.scatter(event_data['timestamp'], [i] * len(event_data), 
-                   alpha=0.6, label=event_type, color=colors[i])
-    
-    plt.xlabel('Time (hours)')
-    plt.ylabel('Event Type')
-    plt.title('Simulation Events Timeline')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig('results/events_timeline.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    return fig
+
+def _timeline_figure(results: SimulationResults, end_time: float) -> Figure:
+    """Events per type and time bucket as a density raster (one row per event type)"""
+    # Event types in order of first occurrence
+    tables = results.events.tables
+    event_types = list(tables)
+    edges = _time_edges(end_time)
+    counts = np.array([np.histogram(_event_times(tables[event_type]), bins=edges)[0]
+                       for event_type in event_types]).reshape(len(event_types), PLOT_BINS)
+    
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+    cmap = matplotlib.colormaps['viridis'].with_extremes(bad='white')
+    # A mesh of cells rather than imshow, which resamples the raster to the full output resolution
+    image = ax.pcolormesh(edges, np.arange(len(event_types) + 1) - 0.5, np.ma.masked_equal(counts, 0),
+                          cmap=cmap, norm=LogNorm(vmin=1, vmax=max(counts.max(), 1)))
+    ax.invert_yaxis()
+    ax.grid(False)
+    ax.set_yticks(range(len(event_types)), event_types)
+    ax.set_xlabel('Time (hours)')
+    ax.set_ylabel('Event Type')
+    ax.set_title(f'Simulation Events Timeline (events per {edges[1]:.3g} h)')
+    fig.colorbar(image, ax=ax, label='Events')
+    fig.tight_layout()
+    return fig
+
+def generate_visualizations(results: SimulationResults, draft: bool = False):
+    """
+    Generate visualization plots from the event columns and the KPI engine's lead times.
+    
+    Every plot is drawn from NumPy-binned data (histograms, PLOT_BINS time
+    buckets), so drawing time does not grow with the number of events. The
+    figures are rendered to PNG one at a time, so only one raster is held
+    in memory at once; draft=True renders them at DRAFT_DPI instead of FINAL_DPI.
+    """
+    
+    matplotlib.style.use('seaborn-v0_8')
+    tables = results.events.tables
+    end_time = results.collector.end_time
+    if end_time is None:
+        end_time = max((float(_event_times(table).max()) for table in tables.values() if table.size),
+                       default=0.0)
+    
+    dpi = DRAFT_DPI if draft else FINAL_DPI
+    _analysis_figure(results, end_time).savefig('results/simulation_analysis.png', dpi=dpi, bbox_inches='tight')
+    _timeline_figure(results, end_time).savefig('results/events_timeline.png', dpi=dpi, bbox_inches='tight')
 
 class NpEncoder(json.JSONEncoder):
     def default(self, o):
@@ -241,14 +290,20 @@ class NpEncoder(json.JSONEncoder):
             return o.tolist()
         return super(NpEncoder, self).default(o)
 
-def save_raw_data(results: Dict[str, Any], kpis: Dict[str, float], 
-                 summary_stats: Dict[str, Any]):
+def save_raw_data(results: SimulationResults, config: Dict[str, Any], save_data: bool = True):
     """Save raw data to files"""
     
-    # Save events to CSV
-    events_df = results.get('events_df', pd.DataFrame())
-    if not events_df.empty:
-        events_df.to_csv('results/simulation_events.csv', index=False)
+    kpis = results.kpis
+    summary_stats = results.summary_stats
+    
+    if not results.streaming and results.events.count:
+        # Typed binary columns that `main.py report --from-results` can reload
+        if save_data:
+            save_results(results, config, 'results/data')
+        
+        # The CSV (the only consumer of the wide all-events DataFrame) is opt-in
+        if config['simulation'].get('export_csv', False):
+            results.events_df.to_csv('results/simulation_events.csv', index=False)
     
     # Save KPIs to JSON
     with open('results/kpis.json', 'w') as f:
@@ -266,4 +321,52 @@ def save_raw_data(results: Dict[str, Any], kpis: Dict[str, float],
         
         json.dump(serializable_stats, f, indent=2, cls=NpEncoder)
     
-    print("Raw data saved to results/ directory")
\ No newline at end of file
+    print("Raw data saved to results/ directory")
+
+def generate_replication_report(replication_results: Dict[str, Any], config: Dict[str, Any]):
+    """Generate report of KPI means and confidence intervals across replications"""
+    
+    os.makedirs('results', exist_ok=True)
+    
+    summary = replication_results['summary']
+    confidence = replication_results['confidence']
+    
+    report_lines = []
+    report_lines.append("# Factory Simulation Replication Report")
+    report_lines.append("=" * 50)
+    report_lines.append("")
+    
+    report_lines.append("## Configuration Summary")
+    report_lines.append(f"- Simulation Duration: {config['simulation']['duration_hours']} hours")
+    if replication_results.get('method') == 'batch_means':
+        report_lines.append(f"- Batch Means: {replication_results['replications']} batches of "
+                            f"{replication_results['batch_hours']:.1f} hours in one run")
+    else:
+        report_lines.append(f"- Replications: {replication_results['replications']}")
+    if replication_results.get('antithetic'):
+        report_lines.append("- Antithetic Variates: each replication is the mean of a mirrored pair of runs")
+    if 'precision' in replication_results:
+        status = 'reached' if replication_results['converged'] else 'not reached'
+        report_lines.append(f"- Stopping Rule: CI half-width <= {replication_results['precision']:.1%} of the mean "
+                            f"for {', '.join(replication_results['precision_kpis'])} ({status})")
+    report_lines.append(f"- Base Random Seed: {config['simulation']['random_seed']}")
+    report_lines.append("")
+    
+    report_lines.append("## Key Performance Indicators")
+    report_lines.append("")
+    report_lines.append(f"| KPI | N | Mean | Std Dev | {confidence:.0%} CI |")
+    report_lines.append("|-----|---|------|---------|--------|")
+    for name, stats in summary.items():
+        if stats['n'] > 1:
+            ci = f"[{stats['ci_low']:.4f}, {stats['ci_high']:.4f}]"
+        else:
+            ci = "n/a"
+        report_lines.append(f"| {name} | {stats['n']} | {stats['mean']:.4f} | {stats['std']:.4f} | {ci} |")
+    
+    with open('results/replication_report.md', 'w') as f:
+        f.write('\n'.join(report_lines))
+    
+    with open('results/replication_kpis.json', 'w') as f:
+        json.dump(replication_results, f, indent=2, cls=NpEncoder)
+    
+    print("Replication report saved to results/ directory")
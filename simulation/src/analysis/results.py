@@ -0,0 +1,77 @@
+"""
+Simulation Results - One run's data and every view derived from it, each computed once
+"""
+
+import numpy as np
+from functools import cached_property
+from typing import TYPE_CHECKING, Dict, Any
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from analysis.data_collector import DataCollector
+    from analysis.kpi_engine import KpiResult
+
+class SimulationResults:
+    """
+    Results of one run, handed from the simulation to the report.
+
+    The event DataFrame, the per-type event tables, the KPIs (with the lead
+    times behind them) and the summary statistics are computed on first use
+    and memoized, so a full report makes one pass over the data for each.
+    Item access (results['kpis']) keeps the interface of the former results dict.
+    """
+
+    KEYS = ('events', 'metrics', 'events_df', 'machine_servers', 'warmup', 'kpis', 'summary_stats')
+
+    def __init__(self, collector: 'DataCollector'):
+        self.collector = collector
+        self.events = collector.events
+        self.metrics = collector.metrics
+        self.machine_servers = collector.machine_servers
+        self.warmup = collector.warmup
+        self._tables = {}
+
+    @property
+    def streaming(self) -> bool:
+        """True if only running KPI statistics were kept (no event log)"""
+        return self.collector.streaming is not None
+
+    @cached_property
+    def events_df(self) -> 'pd.DataFrame':
+        """All events in recording order as one wide DataFrame (only needed for the CSV)"""
+        return self.collector.get_events_df()
+
+    def event_table(self, event_type: str) -> 'pd.DataFrame':
+        """DataFrame of one event type, built on views of the stored columns"""
+        table = self._tables.get(event_type)
+        if table is None:
+            table = self._tables[event_type] = self.collector.get_event_table(event_type)
+        return table
+
+    @cached_property
+    def kpi_result(self) -> 'KpiResult':
+        return self.collector.compute_kpi_result()
+
+    @property
+    def kpis(self) -> Dict[str, float]:
+        return self.kpi_result.kpis
+
+    @property
+    def lead_times(self) -> np.ndarray:
+        """Lead time of every completed order counted in the KPIs"""
+        return self.kpi_result.lead_times
+
+    @cached_property
+    def summary_stats(self) -> Dict[str, Any]:
+        return self.collector.get_summary_stats(self.kpis)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
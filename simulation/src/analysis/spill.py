@@ -0,0 +1,306 @@
+"""
+Spilling Stores - Event and metric columns written to disk in chunks by a background thread during the run
+"""
+
+import os
+import json
+import queue
+import struct
+import threading
+import numpy as np
+from typing import Dict, Any, List
+from analysis.event_store import (INITIAL_CAPACITY, EventStore, EventTable, MetricSeries, MetricStore,
+                                  _KIND_DTYPES, _infer_kind)
+
+CHUNK_EVENTS = 65536  # Rows of one event type (or metric) held in memory before they are handed to the writer
+MAX_PENDING_CHUNKS = 8  # Chunks waiting for the writer; beyond that the simulation waits for the disk
+NPY_HEADER_SIZE = 128  # Reserved at the start of a column file, so the header can be rewritten as it grows
+
+class _ColumnFile:
+    """A 1-D .npy file that grows by appends; its header is rewritten with the length on flush()"""
+    
+    def __init__(self, path: str, dtype: Any):
+        self.file = open(path, 'wb')
+        self.dtype = np.dtype(dtype)
+        self.length = 0
+        self.flush()
+    
+    def append(self, values: Any):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self.file.write(values.data)
+        self.length += len(values)
+    
+    def flush(self):
+        """Make the file a valid .npy of the rows appended so far"""
+        header = repr({'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False,
+                       'shape': (self.length,)})
+        size = NPY_HEADER_SIZE - 10  # After the magic string (6 bytes), version (2) and header length (2)
+        self.file.seek(0)
+        self.file.write(np.lib.format.magic(1, 0) + struct.pack('<H', size)
+                        + header.ljust(size - 1).encode('latin1') + b'\n')
+        self.file.seek(0, os.SEEK_END)
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+class _JsonColumnFile:
+    """A JSON list written value by value; flush() closes the list without ending the file"""
+    
+    def __init__(self, path: str):
+        self.file = open(path, 'w')
+        self.file.write('[')
+        self.length = 0
+    
+    def append(self, values: List[Any]):
+        for value in values:
+            self.file.write((', ' if self.length else '') + json.dumps(value, default=str))
+            self.length += 1
+    
+    def flush(self):
+        position = self.file.tell()
+        self.file.write(']')
+        self.file.flush()
+        self.file.seek(position)  # The next append overwrites the ']'
+    
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class _TableFiles:
+    """The column files of one event type, in the layout of EventTable.save()"""
+    
+    def __init__(self, directory: str, chunk: EventTable):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.event_type = chunk.event_type
+        self.time_position = chunk.time_position
+        self.size = 0
+        self.seq = _ColumnFile(os.path.join(directory, '_seq.npy'), np.int64)
+        self.timestamp = _ColumnFile(os.path.join(directory, '_timestamp.npy'), np.float64)
+        self.fields = {}  # name -> [kind, files], in first-seen order
+    
+    def _add_field(self, name: str, kind: str, values: Any):
+        """Files of a new field; kind is that of its first chunk ('object' becomes int_list if it can)"""
+        path = os.path.join(self.directory, name)
+        if kind == 'object' and not self.size and all(
+                isinstance(value, (list, tuple)) and all(_infer_kind(item) == 'int' for item in value)
+                for value in values):
+            kind = 'int_list'
+            offsets = _ColumnFile(path + '.offsets.npy', np.int64)
+            offsets.append([0])
+            files = (_ColumnFile(path + '.npy', np.int64), offsets)
+        elif kind == 'object':
+            files = (_JsonColumnFile(path + '.json'),)
+            files[0].append([None] * self.size)  # Rows recorded before the field existed
+        else:
+            files = (_ColumnFile(path + '.npy', _KIND_DTYPES[kind]),)
+        self.fields[name] = [kind, files]
+    
+    def append(self, chunk: EventTable):
+        size = chunk.size
+        self.seq.append(chunk.seq[:size])
+        self.timestamp.append(chunk.timestamp[:size])
+        for name, kind, column in chunk.fields:
+            values = column[:size]
+            if name not in self.fields:
+                self._add_field(name, kind, values)
+            file_kind, files = self.fields[name]
+            if file_kind == 'int_list':
+                if kind != 'object' or not all(isinstance(value, (list, tuple)) for value in values):
+                    raise ValueError(f"Field '{name}' of '{self.event_type}' events stopped being a list of "
+                                     f"integers after it was spilled")
+                lengths = np.fromiter((len(value) for value in values), dtype=np.int64, count=size)
+                files[1].append(files[0].length + np.cumsum(lengths))
+                files[0].append(np.fromiter((item for value in values for item in value), dtype=np.int64,
+                                            count=int(lengths.sum())))
+            elif file_kind == 'object':
+                files[0].append([chunk._decode(kind, value) for value in values])
+            elif kind == file_kind:
+                files[0].append(values)
+            else:
+                raise ValueError(f"Field '{name}' of '{self.event_type}' events changed from {file_kind} to "
+                                 f"{kind} after it was spilled")
+        self.size += size
+    
+    def flush(self) -> Dict[str, Any]:
+        """Bring every file up to date and return the schema EventTable.load() reads"""
+        for files in [(self.seq, self.timestamp)] + [files for _, files in self.fields.values()]:
+            for file in files:
+                file.flush()
+        return {'size': self.size, 'time_position': self.time_position,
+                'fields': [[name, kind] for name, (kind, _) in self.fields.items()]}
+    
+    def close(self):
+        for files in [(self.seq, self.timestamp)] + [files for _, files in self.fields.values()]:
+            for file in files:
+                file.close()
+
+class SpillWriter:
+    """
+    Background thread that appends handed-over chunks to the column files under directory.
+    
+    The files have the layout of save_results(), so a synced directory can be
+    memory-mapped back like a saved run. At most MAX_PENDING_CHUNKS chunks
+    wait for the thread; an error in it is raised on the next put() or sync().
+    """
+    
+    def __init__(self, directory: str):
+        from analysis.storage import remove_results
+        remove_results(directory)  # A previous run's files, but nothing else in the directory
+        os.makedirs(os.path.join(directory, 'metrics'), exist_ok=True)
+        
+        self.directory = directory
+        self.tables = {}  # Event type -> _TableFiles
+        self.metrics = {}  # Metric name -> (timestamp file, value file)
+        self.error = None
+        self.queue = queue.Queue(MAX_PENDING_CHUNKS)
+        self.thread = threading.Thread(target=self._run, name='spill-writer', daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                if self.error is None:
+                    self._write(*job)
+            except BaseException as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+    
+    def _write(self, kind: str, name: str, chunk: Any):
+        if kind == 'events':
+            files = self.tables.get(name)
+            if files is None:
+                files = self.tables[name] = _TableFiles(os.path.join(self.directory, 'events', name), chunk)
+            files.append(chunk)
+        else:
+            files = self.metrics.get(name)
+            if files is None:
+                path = os.path.join(self.directory, 'metrics', name)
+                files = self.metrics[name] = (_ColumnFile(path + '.timestamp.npy', np.float64),
+                                              _ColumnFile(path + '.value.npy', np.float64))
+            files[0].append(chunk.timestamp[:chunk.size])
+            files[1].append(chunk.value[:chunk.size])
+    
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError(f"Writing events to {self.directory} failed") from self.error
+    
+    def put(self, kind: str, name: str, chunk: Any):
+        """Hand a full chunk ('events' table or 'metrics' series) to the thread; it must not be changed after"""
+        self._check()
+        self.queue.put((kind, name, chunk))
+    
+    def sync(self, events: 'SpillingEventStore', metrics: 'SpillingMetricStore'):
+        """Write the partly filled chunks, wait for the thread and map the files back into both stores"""
+        events.flush()
+        metrics.flush()
+        self.queue.join()
+        self._check()
+        
+        tables = {event_type: files.flush() for event_type, files in self.tables.items()}
+        events.schema = {'count': events.count, 'strings': list(events.strings.strings), 'tables': tables}
+        events.tables = {event_type: EventTable.load(os.path.join(self.directory, 'events', event_type),
+                                                     event_type, events.strings, schema)
+                         for event_type, schema in tables.items()}
+        for files in self.metrics.values():
+            for file in files:
+                file.flush()
+        mapped = MetricStore.load(os.path.join(self.directory, 'metrics'), list(self.metrics))
+        metrics.clear()
+        metrics.update(mapped)
+    
+    def close(self):
+        """Stop the thread and close the files (call sync() first to keep the last chunks)"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        for files in self.tables.values():
+            files.close()
+        for metric_files in self.metrics.values():
+            for file in metric_files:
+                file.close()
+
+class SpillingEventStore(EventStore):
+    """
+    Event store that keeps at most chunk_events rows per event type in memory.
+    
+    Events go into per-type chunks; a full chunk is handed to the writer
+    thread and a new one started. `tables` holds the memory-mapped files as of
+    the last SpillWriter.sync(), so the KPI and report code reads them like
+    any other store.
+    """
+    
+    def __init__(self, writer: SpillWriter, chunk_events: int = CHUNK_EVENTS):
+        super().__init__()
+        self.writer = writer
+        self.chunk_events = chunk_events
+        self.chunks = {}  # Event type -> EventTable being filled
+        self.schema = None
+    
+    def append(self, event_type: str, data: Dict[str, Any]):
+        """Record one event; 'time' in the payload becomes its timestamp"""
+        chunk = self.chunks.get(event_type)
+        if chunk is None:
+            chunk = self.chunks[event_type] = EventTable(event_type, self.strings, data,
+                                                         min(INITIAL_CAPACITY, self.chunk_events))
+        elif chunk.size == self.chunk_events:
+            self.writer.put('events', event_type, chunk)
+            chunk = self.chunks[event_type] = chunk.empty_like(self.chunk_events)
+        chunk.append(self.count, data.get('time', 0), data)
+        self.count += 1
+    
+    def flush(self):
+        """Hand every non-empty chunk to the writer"""
+        for event_type, chunk in self.chunks.items():
+            if chunk.size:
+                self.writer.put('events', event_type, chunk)
+                self.chunks[event_type] = chunk.empty_like(min(chunk.capacity, self.chunk_events))
+    
+    def save(self, directory: str) -> Dict[str, Any]:
+        """The columns are already in the spill directory; elsewhere they are copied like any store's"""
+        if os.path.abspath(directory) == os.path.abspath(os.path.join(self.writer.directory, 'events')):
+            return self.schema
+        return super().save(directory)
+
+class SpillingMetricStore(MetricStore):
+    """Metric store that keeps at most chunk_events samples per metric in memory (see SpillingEventStore)"""
+    
+    def __init__(self, writer: SpillWriter, chunk_events: int = CHUNK_EVENTS):
+        super().__init__()
+        self.writer = writer
+        self.chunk_events = chunk_events
+        self.chunks = {}  # Metric name -> MetricSeries being filled
+    
+    def append(self, metric_name: str, value: float, timestamp: float):
+        series = self.chunks.get(metric_name)
+        if series is None:
+            series = self.chunks[metric_name] = MetricSeries(min(INITIAL_CAPACITY, self.chunk_events))
+        elif series.size == self.chunk_events:
+            self.writer.put('metrics', metric_name, series)
+            series = self.chunks[metric_name] = MetricSeries(self.chunk_events)
+        series.append(value, timestamp)
+    
+    def append_change(self, metric_name: str, value: float, timestamp: float):
+        """Append a level change; a second change at the same instant replaces the first if still in memory"""
+        series = self.chunks.get(metric_name)
+        if series is not None and series.size and series.timestamp[series.size - 1] == timestamp:
+            series.value[series.size - 1] = value
+        else:
+            self.append(metric_name, value, timestamp)
+    
+    def flush(self):
+        """Hand every non-empty chunk to the writer"""
+        for name, series in self.chunks.items():
+            if series.size:
+                self.writer.put('metrics', name, series)
+                self.chunks[name] = MetricSeries(min(len(series.value), self.chunk_events))
+    
+    def save(self, directory: str) -> List[str]:
+        if os.path.abspath(directory) == os.path.abspath(os.path.join(self.writer.directory, 'metrics')):
+            return list(self)
+        return super().save(directory)
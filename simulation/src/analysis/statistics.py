@@ -0,0 +1,112 @@
+"""
+Statistics - Confidence intervals for KPIs estimated from replications
+"""
+
+import math
+from statistics import NormalDist
+from typing import Dict, List, Any, Iterable
+
+def _betacf(a: float, b: float, x: float) -> float:
+    """Continued fraction for the regularized incomplete beta function"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 200):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-12:
+            break
+    return h
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta function I_x(a, b)"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log1p(-x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+def t_cdf(t: float, df: float) -> float:
+    """Cumulative distribution function of Student's t distribution"""
+    tail = 0.5 * _incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+    return 1.0 - tail if t > 0 else tail
+
+def t_quantile(p: float, df: float) -> float:
+    """Inverse CDF of Student's t distribution (bisection on t_cdf)"""
+    if not 0.0 < p < 1.0:
+        raise ValueError(f"Probability must be in (0, 1), got {p}")
+    if p < 0.5:
+        return -t_quantile(1.0 - p, df)
+    
+    # The normal quantile is a lower bound; widen until it brackets p
+    low = NormalDist().inv_cdf(p)
+    high = max(2.0 * low, 1.0)
+    while t_cdf(high, df) < p:
+        high *= 2.0
+    for _ in range(100):
+        mid = 0.5 * (low + high)
+        if t_cdf(mid, df) < p:
+            low = mid
+        else:
+            high = mid
+        if high - low < 1e-10:
+            break
+    return 0.5 * (low + high)
+
+def confidence_interval(values: Iterable[float], confidence: float = 0.95) -> Dict[str, float]:
+    """Mean, standard deviation and t-based confidence interval of a sample"""
+    samples = [float(v) for v in values]
+    n = len(samples)
+    if n == 0:
+        return {'n': 0}
+    
+    mean = sum(samples) / n
+    if n == 1:
+        return {'n': 1, 'mean': mean, 'std': 0.0, 'half_width': math.nan,
+                'ci_low': math.nan, 'ci_high': math.nan}
+    
+    variance = sum((v - mean) ** 2 for v in samples) / (n - 1)
+    std = math.sqrt(variance)
+    half_width = t_quantile(0.5 + confidence / 2.0, n - 1) * std / math.sqrt(n)
+    
+    return {
+        'n': n,
+        'mean': mean,
+        'std': std,
+        'half_width': half_width,
+        'ci_low': mean - half_width,
+        'ci_high': mean + half_width
+    }
+
+def summarize_kpis(kpi_samples: List[Dict[str, Any]], confidence: float = 0.95) -> Dict[str, Dict[str, float]]:
+    """Summarize every KPI across replications (KPIs missing in a run are skipped)"""
+    names = []
+    for kpis in kpi_samples:
+        for name in kpis:
+            if name not in names:
+                names.append(name)
+    
+    summary = {}
+    for name in names:
+        values = [kpis[name] for kpis in kpi_samples if name in kpis]
+        summary[name] = confidence_interval(values, confidence)
+    
+    return summary
@@ -0,0 +1,75 @@
+"""
+Results Storage - A run's events and metrics as typed .npy columns, memory-mapped back for re-analysis
+"""
+
+import os
+import json
+import shutil
+from typing import Dict, Any, Tuple
+from analysis.data_collector import DataCollector
+from analysis.event_store import EventStore, MetricStore
+from analysis.results import SimulationResults
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+def remove_results(directory: str):
+    """Delete the files of a saved run from directory, but nothing else in it"""
+    for name in ('events', 'metrics'):
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        os.remove(os.path.join(directory, MANIFEST_NAME))
+
+def save_results(results: SimulationResults, config: Dict[str, Any], directory: str = 'results/data'):
+    """
+    Save the event log and level series of a run under directory.
+    
+    Every column is one .npy file (events/<event type>/<field>.npy,
+    metrics/<name>.<timestamp|value>.npy); manifest.json holds the schema,
+    the string pool and the config, so the directory alone is enough to
+    recompute every KPI and plot.
+    """
+    if results.streaming:
+        raise ValueError("A streaming run keeps no event log to save")
+    collector = results.collector
+    # A run spilled to this directory already wrote its columns here; only the manifest is missing
+    spilled = (collector.spill is not None
+               and os.path.abspath(collector.spill.directory) == os.path.abspath(directory))
+    if os.path.exists(os.path.join(directory, MANIFEST_NAME)) and not spilled:
+        remove_results(directory)  # A previous save: drop its files rather than mix the two runs
+    os.makedirs(directory, exist_ok=True)
+    manifest = {
+        'format': FORMAT_VERSION,
+        'config': config,
+        'end_time': collector.end_time,
+        'warmup': collector.warmup,
+        'machine_servers': collector.machine_servers,
+        'events': results.events.save(os.path.join(directory, 'events')),
+        'metrics': results.metrics.save(os.path.join(directory, 'metrics'))
+    }
+    # Written last: a directory without a manifest is an incomplete save
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, default=float)
+
+def load_results(directory: str, mmap: bool = True) -> Tuple[SimulationResults, Dict[str, Any]]:
+    """
+    Results and config of a run saved by save_results.
+    
+    Array columns are memory-mapped read-only, so loading takes milliseconds
+    whatever the size of the run and only the columns an analysis reads are
+    paged in.
+    """
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No saved results in {directory} (missing {MANIFEST_NAME})")
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported results format {manifest.get('format')} in {directory}")
+    
+    collector = DataCollector(warmup=manifest['warmup'])
+    collector.events = EventStore.load(os.path.join(directory, 'events'), manifest['events'], mmap)
+    collector.metrics = MetricStore.load(os.path.join(directory, 'metrics'), manifest['metrics'], mmap)
+    collector.machine_servers = manifest['machine_servers']
+    collector.end_time = manifest['end_time']
+    return collector.get_results(), manifest['config']
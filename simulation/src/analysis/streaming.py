@@ -0,0 +1,329 @@
+"""
+Streaming Statistics - Constant-memory KPI accumulators updated as events arrive
+"""
+
+import math
+import numpy as np
+from typing import Dict, Any
+
+LEAD_TIME_QUANTILES = (0.5, 0.9, 0.95)
+
+class RunningStats:
+    """Count, mean, variance (Welford), min and max of a stream of values"""
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+    
+    def update(self, value: float):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+    
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+class TimeWeightedAverage:
+    """Time-average of a piecewise-constant level (area under the curve / elapsed time)"""
+    
+    def __init__(self):
+        self.start_time = None
+        self.last_time = None
+        self.last_value = 0.0
+        self.area = 0.0
+        self.max = -math.inf
+        self.changes = 0
+    
+    def update(self, value: float, timestamp: float):
+        """Record that the level is `value` from `timestamp` on"""
+        if self.last_time is None:
+            self.start_time = timestamp
+        else:
+            self.area += self.last_value * (timestamp - self.last_time)
+        self.last_time = timestamp
+        self.last_value = value
+        self.changes += 1
+        if value > self.max:
+            self.max = value
+    
+    @classmethod
+    def from_changes(cls, timestamps: np.ndarray, values: np.ndarray,
+                     start_time: float = None) -> 'TimeWeightedAverage':
+        """
+        Tracker of a stored change log (sorted by time), optionally from start_time on.
+        
+        The level in force at start_time carries over, so the average covers
+        exactly [start_time, end_time] (vectorized, no replay loop).
+        """
+        tracker = cls()
+        if start_time is not None and len(timestamps):
+            first = max(np.searchsorted(timestamps, start_time, side='right') - 1, 0)
+            timestamps = np.concatenate(([max(start_time, timestamps[first])], timestamps[first + 1:]))
+            values = values[first:]
+        if not len(timestamps):
+            return tracker
+        tracker.start_time = float(timestamps[0])
+        tracker.last_time = float(timestamps[-1])
+        tracker.last_value = float(values[-1])
+        tracker.area = float(np.dot(values[:-1], np.diff(timestamps)))
+        tracker.max = float(values.max())
+        tracker.changes = len(values)
+        return tracker
+    
+    def restart(self, timestamp: float):
+        """Forget the history before timestamp, keeping the current level"""
+        if self.last_time is None:
+            return
+        self.start_time = self.last_time = timestamp
+        self.area = 0.0
+        self.max = self.last_value
+        self.changes = 1
+    
+    def average(self, end_time: float) -> float:
+        """Time-weighted average from the first sample to end_time"""
+        if self.last_time is None:
+            return math.nan
+        elapsed = end_time - self.start_time
+        if elapsed <= 0:
+            return self.last_value
+        return (self.area + self.last_value * max(end_time - self.last_time, 0.0)) / elapsed
+
+def level_kpis(levels: Dict[str, 'TimeWeightedAverage'], end_time: float) -> Dict[str, float]:
+    """Time-weighted average and maximum KPIs of tracked buffer and inventory levels"""
+    kpis = {}
+    for name, level in levels.items():
+        average = level.average(max(end_time, level.last_time))
+        if name == 'warehouse_level':
+            kpis['average_warehouse_inventory'] = average
+        elif name.startswith('buffer_'):
+            kpis[f'average_{name}_level'] = average
+            kpis[f'max_{name}_level'] = level.max
+        else:
+            kpis[f'average_{name}'] = average
+            kpis[f'max_{name}'] = level.max
+    return kpis
+
+class P2Quantile:
+    """
+    P-square estimate of one quantile (Jain & Chlamtac, 1985).
+    
+    Keeps five markers regardless of the number of observations.
+    """
+    
+    def __init__(self, p: float):
+        self.p = p
+        self.initial = []
+        self.heights = None
+        self.positions = None
+        self.desired = None
+        self.increments = (0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0)
+    
+    def update(self, value: float):
+        if self.heights is None:
+            self.initial.append(value)
+            if len(self.initial) == 5:
+                self.initial.sort()
+                self.heights = self.initial
+                self.positions = [0, 1, 2, 3, 4]
+                p = self.p
+                self.desired = [0.0, 2.0 * p, 4.0 * p, 2.0 + 2.0 * p, 4.0]
+            return
+        
+        q, n = self.heights, self.positions
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+        
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        
+        # Adjust the three middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = candidate
+                n[i] += step
+    
+    def value(self) -> float:
+        if self.heights is not None:
+            return self.heights[2]
+        if not self.initial:
+            return math.nan
+        # Too few observations for the markers: interpolate the sorted sample
+        values = sorted(self.initial)
+        position = self.p * (len(values) - 1)
+        low = int(position)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+class StreamingKpis:
+    """
+    Maintains the DataCollector KPIs incrementally, without keeping events.
+    
+    Memory is independent of the simulated duration: only orders that have
+    arrived but not yet completed (the work in progress) are remembered.
+    Buffer and warehouse levels are time-weighted averages.
+    
+    With a warm-up, only events from `warmup` hours on enter the KPIs (lead
+    times only for orders arriving after it) and levels are averaged from it.
+    """
+    
+    def __init__(self, warmup: float = 0.0):
+        self.warmup = warmup
+        self.duration = 0.0
+        self.event_counts = {}
+        self.arrival_times = {}  # Orders in progress: order_id -> arrival time
+        self.arrivals = 0
+        self.completions = 0
+        self.lead_times = RunningStats()
+        self.lead_time_quantiles = {p: P2Quantile(p) for p in LEAD_TIME_QUANTILES}
+        self.busy_time = {}  # Machine name -> total processing time, in order of appearance
+        self.shipments = 0
+        self.products_shipped = 0.0
+        self.delays = RunningStats()
+        self.warehouse_waits = RunningStats()
+        self.levels = {}  # Level name -> TimeWeightedAverage
+        self.levels_restarted = not warmup
+        self.end_time = None
+    
+    def _restart_levels(self):
+        """Start the level averages at the end of the warm-up"""
+        for tracker in self.levels.values():
+            tracker.restart(self.warmup)
+        self.levels_restarted = True
+    
+    def next_batch(self, timestamp: float) -> 'StreamingKpis':
+        """
+        Accumulators of the next batch of a batch-means run, starting at timestamp.
+        
+        Orders in progress and the current levels carry over, so every order
+        completing in the new batch gives a lead time. Processing started
+        before the boundary counts in neither batch. This batch's level
+        trackers move to the new one, so read its KPIs first.
+        """
+        batch = StreamingKpis(timestamp)
+        batch.duration = timestamp
+        batch.event_counts = self.event_counts
+        batch.arrival_times = self.arrival_times
+        batch.arrivals = self.arrivals
+        for tracker in self.levels.values():
+            tracker.restart(timestamp)
+        batch.levels = self.levels
+        batch.levels_restarted = True
+        self.levels = {}
+        return batch
+    
+    def record_event(self, event_type: str, data: Dict[str, Any]):
+        """Update the accumulators affected by one event"""
+        timestamp = data.get('time', 0)
+        if timestamp > self.duration:
+            self.duration = timestamp
+        self.event_counts[event_type] = self.event_counts.get(event_type, 0) + 1
+        
+        warmup = self.warmup
+        if event_type == 'machine_processing':
+            if data['start_time'] >= warmup:
+                machine = data['machine']
+                self.busy_time[machine] = self.busy_time.get(machine, 0.0) + data['processing_time']
+        elif event_type == 'order_arrival':
+            if timestamp >= warmup:
+                self.arrivals += 1
+                self.arrival_times.setdefault(data['order_id'], timestamp)
+        elif event_type == 'order_completed':
+            if timestamp < warmup:
+                return
+            self.completions += 1
+            arrival_time = self.arrival_times.pop(data['order_id'], None)
+            if arrival_time is not None:
+                lead_time = timestamp - arrival_time
+                self.lead_times.update(lead_time)
+                for estimator in self.lead_time_quantiles.values():
+                    estimator.update(lead_time)
+        elif event_type == 'warehouse_get':
+            if timestamp >= warmup:
+                self.warehouse_waits.update(data['wait_time'])
+        elif event_type == 'lorry_departure':
+            if data['departure_time'] < warmup:
+                return
+            self.shipments += 1
+            self.products_shipped += data['products_shipped']
+            if data['delay_time'] > 0:
+                self.delays.update(data['delay_time'])
+    
+    def record_level(self, name: str, level: float, timestamp: float):
+        """Update the time-weighted average of a tracked level"""
+        if not self.levels_restarted and timestamp >= self.warmup:
+            self._restart_levels()
+        tracker = self.levels.get(name)
+        if tracker is None:
+            tracker = self.levels[name] = TimeWeightedAverage()
+        tracker.update(level, timestamp)
+    
+    def kpis(self, machine_servers: Dict[str, int] = None) -> Dict[str, float]:
+        """Current KPIs, with the same names as the batch KPI engine"""
+        if not self.event_counts:
+            return {}
+        
+        kpis = {}
+        duration = self.duration - self.warmup
+        completions = self.completions
+        
+        if self.arrivals and completions:
+            kpis['throughput_orders_per_hour'] = completions / duration
+            if self.lead_times.count:
+                kpis['average_lead_time_hours'] = self.lead_times.mean
+                kpis['max_lead_time_hours'] = self.lead_times.max
+                kpis['min_lead_time_hours'] = self.lead_times.min
+                for p, estimator in self.lead_time_quantiles.items():
+                    kpis[f'p{p * 100:.0f}_lead_time_hours'] = estimator.value()
+        
+        machine_servers = machine_servers or {}
+        for machine, busy_time in self.busy_time.items():
+            servers = machine_servers.get(machine, 1)
+            kpis[f'{machine.lower().replace(" ", "_")}_utilization'] = busy_time / (servers * duration)
+        
+        if self.shipments:
+            kpis['total_shipments'] = self.shipments
+            kpis['total_products_shipped'] = self.products_shipped
+            kpis['average_products_per_shipment'] = self.products_shipped / self.shipments
+            kpis['delay_rate'] = self.delays.count / self.shipments
+            if self.delays.count:
+                kpis['average_delay_time_hours'] = self.delays.mean
+        
+        if self.warehouse_waits.count:
+            kpis['average_warehouse_wait_time'] = self.warehouse_waits.mean
+        
+        end_time = self.end_time if self.end_time is not None else self.duration
+        if not self.levels_restarted and end_time >= self.warmup:
+            self._restart_levels()
+        kpis.update(level_kpis(self.levels, end_time))
+        if self.warmup:
+            kpis['warmup_hours'] = self.warmup
+        
+        return kpis
@@ -0,0 +1,40 @@
+"""
+Warm-up Detection - MSER-5 truncation point of the order completion stream
+"""
+
+import numpy as np
+
+MSER_BATCH_SIZE = 5
+
+def mser_truncation(values: np.ndarray, batch_size: int = MSER_BATCH_SIZE) -> int:
+    """
+    Number of leading observations to delete, by MSER-m (White, 1997).
+    
+    The series is averaged in batches of `batch_size`; the truncation point d
+    minimizes the squared standard error of the mean of the batches after it,
+    SSE(d) / (k - d)^2, over the first half of the k batches.
+    """
+    batches = len(values) // batch_size
+    if batches < 4:
+        return 0
+    means = np.asarray(values[:batches * batch_size], dtype=float).reshape(batches, batch_size).mean(axis=1)
+    
+    # Sums over every suffix of the batch means, all at once
+    suffix = means[::-1]
+    counts = np.arange(1, batches + 1)
+    sums = np.cumsum(suffix)
+    squares = np.cumsum(suffix * suffix)
+    statistic = ((squares - sums * sums / counts) / counts ** 2)[::-1]  # Index d = suffix from batch d
+    
+    return int(np.argmin(statistic[:batches // 2 + 1])) * batch_size
+
+def detect_warmup(completion_times: np.ndarray, lead_times: np.ndarray) -> float:
+    """
+    Warm-up length in hours: the completion time of the last order MSER-5
+    deletes from the lead times in completion order (0 if none).
+    """
+    order = np.argsort(completion_times, kind='stable')
+    truncation = mser_truncation(np.asarray(lead_times)[order])
+    if truncation == 0:
+        return 0.0
+    return float(np.asarray(completion_times)[order][truncation - 1])
@@ -0,0 +1,429 @@
+"""
+Factory Approximation - Analytical estimate of a config's KPIs by decomposition of the production line
+"""
+
+import math
+from functools import cached_property
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
+from components.random_streams import normalize_distribution, distribution_mean
+from simulation import stage_label, buffer_size
+
+# Gauss-Legendre rule on [-1, 1] for averaging the pending queue over the observed window
+_GAUSS_LEGENDRE = tuple(zip(*(points.tolist() for points in np.polynomial.legendre.leggauss(16))))
+
+# A machine of the fluid model: (rate in items/hour, failure rate 1/mtbf, repair rate 1/mttr)
+Machine = Tuple[float, float, float]
+
+def distribution_scv(spec: Any) -> float:
+    """Squared coefficient of variation (variance / mean^2) of a distribution spec"""
+    spec = normalize_distribution(spec)
+    distribution = spec['distribution']
+    if distribution == 'exponential':
+        return 1.0
+    if distribution == 'lognormal':
+        return spec.get('cv', 1.0) ** 2  # The samplers' default
+    if distribution == 'weibull':
+        shape = spec['shape']
+        return math.gamma(1.0 + 2.0 / shape) / math.gamma(1.0 + 1.0 / shape) ** 2 - 1.0
+    if distribution == 'empirical':
+        values = np.asarray(spec['values'], dtype=float)
+        return float(values.var() / values.mean() ** 2)
+    return 1.0 / 3.0  # uniform on [0, 1)
+
+def machine_names(machine_config: Dict[str, Any]) -> List[str]:
+    """Names of the machines of a stage, as the simulation numbers its parallel machines"""
+    parallel = machine_config.get('parallel', 1)
+    return [machine_config['name']] if parallel == 1 else [f"{machine_config['name']} {i + 1}" for i in range(parallel)]
+
+def utilization_kpi(machine_name: str) -> str:
+    """Name of a machine's utilization KPI"""
+    return f'{machine_name.lower().replace(" ", "_")}_utilization'
+
+def availability(machine: Machine) -> float:
+    """Long-run fraction of time a machine is up"""
+    _, failure_rate, repair_rate = machine
+    return repair_rate / (failure_rate + repair_rate)
+
+def _solve(matrix: List[List[float]], rhs: List[float]) -> List[float]:
+    """Solution of a small linear system (Gaussian elimination with partial pivoting)"""
+    n = len(rhs)
+    rows = [row[:] + [value] for row, value in zip(matrix, rhs)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda row: abs(rows[row][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for row in range(col + 1, n):
+            factor = rows[row][col] / rows[col][col]
+            for j in range(col, n + 1):
+                rows[row][j] -= factor * rows[col][j]
+    solution = [0.0] * n
+    for row in reversed(range(n)):
+        solution[row] = (rows[row][n] - sum(rows[row][j] * solution[j] for j in range(row + 1, n))) / rows[row][row]
+    return solution
+
+def _left_null_vector(matrix: List[List[float]]) -> List[float]:
+    """Nonzero v with v @ matrix = 0, for a singular 2x2 or 3x3 matrix"""
+    if len(matrix) == 2:
+        candidates = [[matrix[1][j], -matrix[0][j]] for j in range(2)]
+    else:
+        columns = [[row[j] for row in matrix] for j in range(3)]
+        candidates = []
+        for a, b in ((0, 1), (0, 2), (1, 2)):
+            u, v = columns[a], columns[b]
+            candidates.append([u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0]])
+    return max(candidates, key=lambda vector: math.hypot(*vector))
+
+def two_machine_line(upstream: Machine, downstream: Machine, capacity: float) -> Tuple[float, float]:
+    """
+    Throughput and mean buffer level of two unreliable machines around a buffer.
+    
+    Continuous-flow model: each machine alternates exponential up and down
+    times and, while up, works at its rate unless starved or blocked. The
+    buffer level is a fluid queue modulated by the four up/down states
+    (11, 10, 01, 00), so P(level <= x, state) is a sum of exponentials in x.
+    States that leave the level unchanged are eliminated; the scaled
+    generator of the rest has eigenvalue 0 and two (one) others, the roots of
+    a quadratic, so everything is solved in closed form on plain floats
+    (microseconds, where a NumPy eigensolver on a 4x4 matrix costs more in
+    call overhead than in arithmetic).
+    """
+    (rate1, p1, r1), (rate2, p2, r2) = upstream, downstream
+    a1, a2 = availability(upstream), availability(downstream)
+    if abs(a1 * rate1 - a2 * rate2) < 1e-9 * (rate1 + rate2):
+        rate1 *= 1.0 + 1e-6  # A balanced line has a double zero eigenvalue: unbalance it slightly
+    generator = [[-(p1 + p2), p2, p1, 0.0],
+                 [r2, -(p1 + r2), 0.0, p1],
+                 [r1, 0.0, -(r1 + p2), p2],
+                 [0.0, r1, r2, -(r1 + r2)]]
+    drift = [rate1 - rate2, rate1, -rate2, 0.0]
+    stationary = [a1 * a2, a1 * (1.0 - a2), (1.0 - a1) * a2, (1.0 - a1) * (1.0 - a2)]
+    
+    # Eliminate the states of zero drift (both down; both up at equal rates), where F_s = sum_i F_i w_i
+    active = [0, 1, 2, 3]
+    eliminated = []
+    for state in (3, 0):
+        if abs(drift[state]) > 1e-9 * (rate1 + rate2):
+            continue
+        active.remove(state)
+        weights = [(i, generator[i][state] / -generator[state][state]) for i in active]
+        for i, weight in weights:
+            for j in active:
+                generator[i][j] += weight * generator[state][j]
+        eliminated.append((state, weights))
+    
+    # F(x) = sum_k c_k exp(z_k x) phi_k with phi_k M = z_k phi_k, M = Q~ / drift
+    matrix = [[generator[i][j] / drift[j] for j in active] for i in active]
+    size = len(active)
+    trace = sum(matrix[i][i] for i in range(size))
+    if size == 2:
+        eigenvalues = [0.0, trace]
+    else:
+        minors = sum(matrix[i][i] * matrix[j][j] - matrix[i][j] * matrix[j][i]
+                     for i, j in ((0, 1), (0, 2), (1, 2)))
+        root = math.sqrt(max(trace * trace - 4.0 * minors, 0.0))
+        eigenvalues = [0.0, (trace - root) / 2.0, (trace + root) / 2.0]
+    modes = []
+    for z in eigenvalues:
+        vector = _left_null_vector([[matrix[i][j] - (z if i == j else 0.0) for j in range(size)]
+                                    for i in range(size)])
+        mode = [0.0] * 4
+        for i, value in zip(active, vector):
+            mode[i] = value
+        for state, weights in reversed(eliminated):
+            mode[state] = sum(mode[i] * weight for i, weight in weights)
+        modes.append(mode)
+    
+    # Each exponential is scaled to at most 1 on [0, capacity] to keep the system well conditioned
+    at_zero = [math.exp(-z * capacity) if z > 0 else 1.0 for z in eigenvalues]
+    at_capacity = [1.0 if z > 0 else math.exp(z * capacity) for z in eigenvalues]
+    # An empty buffer cannot stay empty while it fills; a full one cannot stay full while it drains
+    system, target = [], []
+    for i in active:
+        if drift[i] > 0:
+            system.append([scale * mode[i] for scale, mode in zip(at_zero, modes)])
+            target.append(0.0)
+        else:
+            system.append([scale * mode[i] for scale, mode in zip(at_capacity, modes)])
+            target.append(stationary[i])
+    coefficients = _solve(system, target)
+    
+    # Output is lost while the buffer is empty in a state where the upstream machine cannot keep up
+    empty = [c * scale for c, scale in zip(coefficients, at_zero)]
+    throughput = a2 * rate2 - rate2 * sum(weight * mode[2] for weight, mode in zip(empty, modes))
+    if drift[0] < 0:
+        throughput -= (rate2 - rate1) * sum(weight * mode[0] for weight, mode in zip(empty, modes))
+    
+    # E[X] = capacity - integral of P(X <= x) over [0, capacity)
+    integral = 0.0
+    for c, z, low, high, mode in zip(coefficients, eigenvalues, at_zero, at_capacity, modes):
+        integral += c * (capacity if z == 0.0 else (high - low) / z) * sum(mode)
+    return throughput, min(max(capacity - integral, 0.0), capacity)
+
+def equivalent_machine(machine: Machine, throughput: float, stoppage_repair_rate: float) -> Machine:
+    """
+    Machine that works at the rate of `machine` but only delivers throughput.
+    
+    The output lost beyond the machine's own failures is taken as extra
+    stoppages (starvation or blocking by a neighbour, or no work to do) that
+    end at stoppage_repair_rate; the equivalent's repair rate mixes the two
+    kinds of stoppage by their frequency.
+    """
+    rate, _, repair_rate = machine
+    machine_availability = availability(machine)
+    equivalent_availability = min(throughput / rate, machine_availability)
+    down = 1.0 - equivalent_availability
+    if down <= 0.0:
+        return machine
+    stoppages = ((1.0 - machine_availability) * repair_rate
+                 + (machine_availability - equivalent_availability) * stoppage_repair_rate)
+    equivalent_repair_rate = stoppages / down
+    return rate, equivalent_repair_rate * down / equivalent_availability, equivalent_repair_rate
+
+def aggregate(first: Machine, second: Machine, capacity: float, keep: int) -> Machine:
+    """
+    One machine equivalent to a two-machine line (Buzacott aggregation).
+    
+    The equivalent works at the rate of machine `keep` (1 downstream for the
+    forward pass, 0 upstream for the backward pass) with the line's
+    throughput, and is down while that machine is down or starved (blocked)
+    by the other.
+    """
+    throughput, _ = two_machine_line(first, second, capacity)
+    kept, other = (second, first) if keep == 1 else (first, second)
+    return equivalent_machine(kept, throughput, other[2])
+
+def _normal_density(z: float) -> float:
+    return math.exp(-0.5 * z * z) / math.sqrt(2.0 * math.pi)
+
+def _normal_cdf(z: float) -> float:
+    return 0.5 * (1.0 + math.erf(z / math.sqrt(2.0)))
+
+def _expected_queue(drift: float, variance: float, t: float) -> float:
+    """Mean at time t of a reflected Brownian motion started empty (drift and variance per hour)"""
+    if t <= 0.0:
+        return 0.0
+    sigma = math.sqrt(variance * t)
+    a = drift * t / sigma
+    if abs(drift) < 1e-12:
+        return 2.0 * sigma * _normal_density(a)
+    cdf = _normal_cdf(a)
+    return drift * t * cdf + sigma * _normal_density(a) + variance / (2.0 * drift) * (2.0 * cdf - 1.0)
+
+def _window_mean(drift: float, variance: float, start: float, end: float) -> float:
+    """Time average of the expected queue over [start, end]"""
+    if end <= start:
+        return _expected_queue(drift, variance, start)
+    half = (end - start) / 2.0
+    return sum(weight * _expected_queue(drift, variance, start + half * (node + 1.0))
+               for node, weight in _GAUSS_LEGENDRE) / 2.0
+
+class FactoryApproximation:
+    """
+    Analytical KPI estimates of a factory config, without simulating it.
+    
+    Takes the same config as FactorySimulation. The production line is
+    decomposed into two-machine lines: for every buffer, the stages before it
+    are aggregated into one equivalent unreliable machine (forward pass) and
+    the stages after it into another (backward pass), and the continuous-flow
+    two-machine model gives the buffer's mean level and the line's
+    throughput. A full finished storage (lorries away) takes output off that
+    capacity and the parts supply and the lorries cap it. The pending orders
+    are a reflected Brownian queue fed by the order arrivals and served at
+    that capacity, averaged over the observed window so that an overloaded
+    finite run is estimated too.
+    
+    An estimate takes about a millisecond, so configs can be screened and
+    only the competitive ones simulated (see
+    experiments.screening.validate_approximation for its error).
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        production_config = config['production_line']
+        self.machine_configs = production_config['machines']
+        self.stages: List[Machine] = []
+        for machine_config in self.machine_configs:
+            workers = machine_config.get('parallel', 1) * machine_config.get('servers', 1)
+            self.stages.append((workers * 60.0 / machine_config['processing_time_minutes'],
+                                1.0 / distribution_mean(machine_config['mtbf_hours']),
+                                1.0 / distribution_mean(machine_config['mttr_hours'])))
+        labels = [stage_label(machine_config['name']) for machine_config in self.machine_configs]
+        self.buffer_names = [f'buffer_{upstream}_{downstream}' for upstream, downstream in zip(labels, labels[1:])]
+        self.buffer_capacities = [buffer_size(production_config, name) for name in self.buffer_names]
+        self.repair_scvs = [distribution_scv(machine_config['mttr_hours']) for machine_config in self.machine_configs]
+    
+    @cached_property
+    def backward(self) -> List[Machine]:
+        """Stages i.. of the line aggregated into one machine, for every i (backward pass)"""
+        backward = [self.stages[-1]]
+        for stage, capacity in zip(reversed(self.stages[:-1]), reversed(self.buffer_capacities)):
+            backward.append(aggregate(stage, backward[-1], capacity, keep=0))
+        return backward[::-1]
+    
+    def line_estimates(self, first: Optional[Machine] = None) -> Tuple[float, List[float]]:
+        """
+        Throughput of the production line and mean buffer levels.
+        
+        With the first stage saturated by default; `first` replaces it (the
+        first stage idled by a lack of orders). Buffer i is the two-machine
+        line between stages ..i aggregated forward and i+1.. aggregated
+        backward, and the throughput is the mean over the buffers.
+        """
+        upstream = self.stages[0] if first is None else first
+        if len(self.stages) == 1:
+            return availability(upstream) * upstream[0], []
+        
+        throughputs, levels = [], []
+        for stage, downstream, capacity in zip(self.stages[1:], self.backward[1:], self.buffer_capacities):
+            throughput, level = two_machine_line(upstream, downstream, capacity)
+            throughputs.append(throughput)
+            levels.append(level)
+            if len(levels) < len(self.buffer_capacities):
+                upstream = aggregate(upstream, stage, capacity, keep=1)
+        return sum(throughputs) / len(throughputs), levels
+    
+    def departure_variance(self, throughput: float) -> float:
+        """
+        Variance per hour of the line's output while it has orders.
+        
+        Breakdowns make each stage's output bursty: its effective process time
+        has squared coefficient of variation (1 + cr^2) A (1 - A) mttr / t0
+        (processing itself is deterministic), with cr^2 that of the repair
+        times. Each stage contributes in proportion to the square of its load
+        at this throughput, so the bottleneck dominates.
+        """
+        scv = 0.0
+        for stage, repair_scv in zip(self.stages, self.repair_scvs):
+            rate, _, repair_rate = stage
+            stage_availability = availability(stage)
+            load = throughput / (stage_availability * rate)
+            scv += load * load * (1.0 + repair_scv) * stage_availability * (1.0 - stage_availability) * rate / repair_rate
+        return throughput * scv
+    
+    def supply_capacity(self, duration: float) -> float:
+        """Orders per hour the parts warehouse can supply over the run"""
+        warehouse_config = self.config['parts_warehouse']
+        delivered = (min(warehouse_config['initial_parts'], warehouse_config['capacity'])
+                     + warehouse_config['replenishment_quantity']
+                     * math.floor(duration / warehouse_config['replenishment_interval_hours']))
+        return delivered / duration
+    
+    def logistics_capacity(self) -> float:
+        """Products per hour the lorries can ship"""
+        logistics_config = self.config['logistics']
+        driver_config = logistics_config['driver']
+        trip = (logistics_config.get('round_trip_hours', 2.0)
+                + driver_config['car_issue_prob'] * distribution_mean(driver_config['issue_delay_hours']))
+        return logistics_config.get('num_lorries', 1) * logistics_config['lorry_capacity'] / trip
+    
+    def finished_storage(self, throughput: float, variance: float, slack: float) -> Tuple[float, float]:
+        """
+        Fraction of the line's output lost to a full finished storage, and the storage's mean level.
+        
+        While the lorries are away (a round trip between two of them, plus an
+        issue delay on some trips) production (mean throughput, variance per
+        hour `variance`) piles up in the storage. What exceeds a load is left
+        for the next lorry; what exceeds the storage capacity plus the slack of
+        the last buffer (less that carry-over) blocks the line and is lost.
+        The level is a sawtooth between two loads on top of the carry-over.
+        """
+        logistics_config = self.config['logistics']
+        driver_config = logistics_config['driver']
+        num_lorries = logistics_config.get('num_lorries', 1)
+        away = logistics_config.get('round_trip_hours', 2.0) / num_lorries
+        delay = distribution_mean(driver_config['issue_delay_hours']) / num_lorries
+        load = logistics_config['lorry_capacity']
+        if logistics_config.get('max_wait_hours') is not None:
+            load = min(load, throughput * (logistics_config['max_wait_hours'] + away))
+        capacity = self.config['finished_storage']['capacity']
+        
+        # A trip without issue: normal production over the round trip
+        mean, deviation = throughput * away, math.sqrt(variance * away)
+        
+        def excess(level: float) -> float:
+            """Expected production beyond level during a trip"""
+            if deviation <= 0:
+                return max(mean - level, 0.0)  # No variation (e.g. no round trip): deterministic
+            z = (level - mean) / deviation
+            return deviation * _normal_density(z) - (level - mean) * (1.0 - _normal_cdf(z))
+        
+        carry_over = excess(load)
+        room = capacity + slack - carry_over
+        # A delayed trip: production over an exponential delay dominates
+        if delay > 0:
+            spare = room / throughput - away  # Hours of delay the storage absorbs
+            delayed = throughput * (delay * math.exp(-spare / delay) if spare > 0 else delay - spare)
+        else:
+            delayed = excess(room)  # Issues cost no time: a trip with one is a normal trip
+        
+        issue_prob = driver_config['car_issue_prob']
+        lost = (1.0 - issue_prob) * excess(room) + issue_prob * delayed
+        return lost / (load + lost), min(load / 2.0 + carry_over, capacity)
+    
+    def _warehouse_level(self, throughput: float, start: float, end: float) -> float:
+        """Mean parts inventory over [start, end] with deliveries clipped to the warehouse capacity"""
+        warehouse_config = self.config['parts_warehouse']
+        interval = warehouse_config['replenishment_interval_hours']
+        capacity = warehouse_config['capacity']
+        net = warehouse_config['replenishment_quantity'] - throughput * interval  # Change per interval
+        periods = np.arange(math.ceil(end / interval))
+        initial = min(warehouse_config['initial_parts'], capacity)
+        if net >= 0:
+            after_delivery = np.minimum(initial + periods * net, capacity)
+        else:
+            after_delivery = initial + periods * net
+        mean_level = np.clip(after_delivery - throughput * interval / 2.0, 0.0, capacity)
+        overlap = np.clip(np.minimum((periods + 1) * interval, end) - np.maximum(periods * interval, start), 0.0, None)
+        return float(mean_level @ overlap / overlap.sum())
+    
+    def estimate(self) -> Dict[str, float]:
+        """KPI estimates under the names the simulation reports them"""
+        sim_config = self.config['simulation']
+        duration = sim_config['duration_hours']
+        warmup = sim_config.get('warmup_hours', 0.0)
+        warmup = 0.0 if warmup == 'auto' else warmup
+        arrival_spec = self.config['order_arrival']['interarrival_time_hours']
+        arrival_rate = 1.0 / distribution_mean(arrival_spec)
+        
+        line_throughput, buffer_levels = self.line_estimates()
+        slack = self.buffer_capacities[-1] - buffer_levels[-1] if buffer_levels else 0.0
+        lost, storage_level = self.finished_storage(line_throughput, self.departure_variance(line_throughput), slack)
+        line_throughput *= 1.0 - lost
+        capacity = min(line_throughput, self.supply_capacity(duration), self.logistics_capacity())
+        
+        # Pending orders: arrivals in, departures at the capacity made bursty by breakdowns
+        drift = arrival_rate - capacity
+        variance = arrival_rate * distribution_scv(arrival_spec) + self.departure_variance(capacity)
+        average_pending = _window_mean(drift, variance, warmup, duration)
+        throughput = arrival_rate - ((_expected_queue(drift, variance, duration) - _expected_queue(drift, variance, warmup))
+                                     / (duration - warmup))
+        
+        # Only orders that complete count: under overload those that arrived early in the window
+        last_arrival = warmup + (duration - warmup) * min(1.0, throughput / arrival_rate)
+        queue_time = _window_mean(drift, variance, warmup, last_arrival) / capacity
+        if throughput < capacity:
+            # The first stage idles while no order is pending, a fraction 1 - throughput / capacity
+            # of the time, in idle periods of 1 / arrival rate on average
+            first = self.stages[0]
+            idled = equivalent_machine(first, availability(first) * first[0] * throughput / capacity, arrival_rate)
+            _, buffer_levels = self.line_estimates(idled)
+        processing_hours = [machine_config['processing_time_minutes'] / 60.0 for machine_config in self.machine_configs]
+        flow_time = (sum(hours / availability(stage) for hours, stage in zip(processing_hours, self.stages))
+                     + sum(buffer_levels) / throughput)
+        
+        kpis = {
+            'throughput_orders_per_hour': throughput,
+            'average_lead_time_hours': queue_time + flow_time,
+            'average_pending_orders': average_pending,
+            'average_wip': average_pending + sum(buffer_levels) + throughput * sum(processing_hours),
+        }
+        for name, level in zip(self.buffer_names, buffer_levels):
+            kpis[f'average_{name}_level_level'] = level
+        for machine_config, hours in zip(self.machine_configs, processing_hours):
+            workers = machine_config.get('parallel', 1) * machine_config.get('servers', 1)
+            for name in machine_names(machine_config):
+                kpis[utilization_kpi(name)] = throughput * hours / workers
+        
+        kpis['average_finished_storage_level'] = storage_level
+        kpis['average_warehouse_inventory'] = self._warehouse_level(throughput, warmup, duration)
+        return kpis
@@ -3,23 +3,33 @@ Logistics Component - Lorry Driver and Departure Process
 """
 
 import simpy
-import random
 import logging
-from typing import Any
+from typing import Any, Optional
+from components.buffers import TrackedStore
+from components.random_streams import RandomStreams
 
 class LorryDriver:
     """Lorry driver responsible for shipping finished products"""
     
-    def __init__(self, env: simpy.Environment, finished_storage: simpy.Store,
-                 capacity: int, car_issue_prob: float, issue_delay: float,
-                 data_collector: Any):
+    def __init__(self, env: simpy.Environment, finished_storage: TrackedStore,
+                 capacity: int, car_issue_prob: float, issue_delay: Any,
+                 data_collector: Any, num_lorries: int = 1, round_trip: float = 2.0,
+                 max_wait: Optional[float] = None, random_streams: RandomStreams = None):
         self.env = env
         self.finished_storage = finished_storage
         self.capacity = capacity
         self.car_issue_prob = car_issue_prob
         self.issue_delay = issue_delay
         self.data_collector = data_collector
+        self.num_lorries = num_lorries
+        self.round_trip = round_trip  # Hours until a departed lorry is back
+        self.max_wait = max_wait  # Hours a lorry waits for a full load (None = always wait)
+        
+        random_streams = random_streams or RandomStreams(None)
+        self.car_issue_draw = random_streams.sampler('logistics/car_issue')
+        self.issue_delay_time = random_streams.sampler('logistics/issue_delay', issue_delay)
         self.logger = logging.getLogger(__name__)
+        self.order_logger = logging.getLogger(f'{__name__}.orders')
         
         # Statistics
         self.total_shipments = 0
@@ -27,74 +37,79 @@ class LorryDriver:
         self.total_delays = 0
         self.total_delay_time = 0.0
         
-        self.logger.info(f"Lorry driver initialized (capacity: {capacity}, "
-                        f"issue prob: {car_issue_prob:.1%}, issue delay: {issue_delay}h)")
+        self.logger.info("Lorry driver initialized (%d lorries, capacity: %d, issue prob: %.1f%%, "
+                         "issue delay: %sh, round trip: %sh, max wait: %sh)", num_lorries, capacity,
+                         car_issue_prob * 100, issue_delay, round_trip, max_wait)
+    
+    def load(self):
+        """
+        Wait for a load and take it from storage in one operation.
+        
+        The lorry leaves as soon as the storage holds a full load. With a max
+        wait it leaves at the deadline with whatever is stored (or with the
+        first product to arrive after it).
+        """
+        batch = self.finished_storage.get_batch(self.capacity)
+        if self.max_wait is None:
+            return (yield batch)
+        
+        yield batch | self.env.timeout(self.max_wait)
+        if batch.triggered:
+            return batch.value
+        batch.cancel()
+        return (yield self.finished_storage.get_batch(self.capacity, minimum=1))
     
-    def departure_process(self):
-        """Main departure process - collect and ship products"""
+    def departure_process(self, lorry: int = 0):
+        """Main departure process of one lorry - collect and ship products"""
         while True:
-            # Wait until we have enough products to fill the lorry
-            products_to_ship = []
+            products_to_ship = yield from self.load()
             
-            # Collect products up to lorry capacity
-            for _ in range(self.capacity):
-                try:
-                    # Wait for a product to be available
-                    product = yield self.finished_storage.get()
-                    products_to_ship.append(product)
-                except simpy.Interrupt:
-                    break
+            departure_time = self.env.now
+            num_products = len(products_to_ship)
             
-            if products_to_ship:
-                departure_time = self.env.now
-                num_products = len(products_to_ship)
-                
-                self.logger.info(f"Lorry loaded with {num_products} products at time {departure_time:.2f}")
-                
-                # Check for car issues
-                delay_time = 0.0
-                if random.random() < self.car_issue_prob:
-                    delay_time = random.expovariate(1.0 / self.issue_delay)
-                    self.total_delays += 1
-                    self.total_delay_time += delay_time
-                    
-                    self.logger.warning(f"Car issue occurred! Delay: {delay_time:.2f}h at time {self.env.now:.2f}")
-                    
-                    # Record car issue event
-                    self.data_collector.record_event('car_issue', {
-                        'time': self.env.now,
-                        'delay_time': delay_time,
-                        'products_affected': num_products
-                    })
-                    
-                    # Wait for the delay
-                    yield self.env.timeout(delay_time)
-                
-                # Simulate departure (assume instant for now, could add travel time)
-                actual_departure_time = self.env.now
-                
-                # Update statistics
-                self.total_shipments += 1
-                self.total_products_shipped += num_products
+            self.order_logger.info("Lorry %d loaded with %d products at time %.2f",
+                                   lorry, num_products, departure_time)
+            
+            # Check for car issues
+            delay_time = 0.0
+            if self.car_issue_draw() < self.car_issue_prob:
+                delay_time = self.issue_delay_time()
+                self.total_delays += 1
+                self.total_delay_time += delay_time
                 
-                self.logger.info(f"Lorry departed at time {actual_departure_time:.2f} "
-                               f"with {num_products} products (delay: {delay_time:.2f}h)")
+                self.logger.warning("Car issue occurred! Delay: %.2fh at time %.2f", delay_time, self.env.now)
                 
-                # Record departure event
-                self.data_collector.record_event('lorry_departure', {
-                    'departure_time': actual_departure_time,
-                    'products_shipped': num_products,
+                # Record car issue event
+                self.data_collector.record_event('car_issue', {
+                    'time': self.env.now,
                     'delay_time': delay_time,
-                    'product_ids': products_to_ship
+                    'products_affected': num_products
                 })
                 
-                # Simulate time for lorry to return (could be configurable)
-                return_time = 2.0  # 2 hours round trip
-                yield self.env.timeout(return_time)
+                # Wait for the delay
+                yield self.env.timeout(delay_time)
+            
+            # Departure itself is instant
+            actual_departure_time = self.env.now
+            
+            # Update statistics
+            self.total_shipments += 1
+            self.total_products_shipped += num_products
+            
+            self.order_logger.info("Lorry %d departed at time %.2f with %d products (delay: %.2fh)",
+                                   lorry, actual_departure_time, num_products, delay_time)
+            
+            # Record departure event
+            self.data_collector.record_event('lorry_departure', {
+                'departure_time': actual_departure_time,
+                'lorry': lorry,
+                'products_shipped': num_products,
+                'delay_time': delay_time,
+                'product_ids': products_to_ship
+            })
             
-            else:
-                # No products available, wait a bit before checking again
-                yield self.env.timeout(0.5)  # Check every 30 minutes
+            # Lorry is away until it is back from the round trip
+            yield self.env.timeout(self.round_trip)
     
     def get_logistics_stats(self):
         """Get logistics performance statistics"""
@@ -3,34 +3,45 @@ Production Machine Component
 """
 
 import simpy
-import random
 import logging
 from typing import Any
+from components.random_streams import RandomStreams
 
 class ProductionMachine:
     """Production machine with failure and repair logic"""
     
     def __init__(self, env: simpy.Environment, name: str, processing_time: float,
-                 mtbf: float, mttr: float, data_collector: Any):
+                 mtbf: Any, mttr: Any, data_collector: Any, servers: int = 1,
+                 random_streams: RandomStreams = None):
         self.env = env
         self.name = name
         self.processing_time = processing_time / 60.0  # Convert minutes to hours
-        self.mtbf = mtbf  # Mean Time Between Failures (hours)
-        self.mttr = mttr  # Mean Time To Repair (hours)
+        self.mtbf = mtbf  # Mean Time Between Failures (hours), or a distribution spec
+        self.mttr = mttr  # Mean Time To Repair (hours), or a distribution spec
         self.data_collector = data_collector
+        self.servers = servers  # Items processed at the same time; a failure stops all of them
+        
+        # Separate streams, so that changing the MTTR does not move the failure times
+        random_streams = random_streams or RandomStreams(None)
+        self.time_to_failure = random_streams.sampler(f'{name}/failure', mtbf)
+        self.time_to_repair = random_streams.sampler(f'{name}/repair', mttr)
         self.logger = logging.getLogger(__name__)
+        self.order_logger = logging.getLogger(f'{__name__}.orders')
         
-        # Machine resource (capacity 1 = single machine)
-        self.machine = simpy.Resource(env, capacity=1)
+        # Machine resource (capacity = number of servers)
+        self.machine = simpy.Resource(env, capacity=servers)
+        data_collector.register_machine(name, servers)
         
         # Machine state tracking
         self.is_broken = False
+        self.repaired = None  # Event triggered when the current breakdown is repaired
+        self.active_processes = set()  # Processes currently running an item on this machine
         self.total_processing_time = 0.0
         self.total_broken_time = 0.0
         self.items_processed = 0
         
-        self.logger.info(f"{self.name} initialized (processing: {processing_time}min, "
-                        f"MTBF: {mtbf}h, MTTR: {mttr}h)")
+        self.logger.info("%s initialized (processing: %smin, MTBF: %sh, MTTR: %sh)",
+                         self.name, processing_time, mtbf, mttr)
     
     def process_item(self, item_id: int):
         """Process a single item"""
@@ -39,52 +50,80 @@ class ProductionMachine:
         # Request machine resource
         with self.machine.request() as request:
             yield request
-            
-            # Check if machine is broken
-            if self.is_broken:
-                self.logger.debug(f"{self.name} is broken, waiting for repair...")
-                # Wait until machine is repaired
-                while self.is_broken:
-                    yield self.env.timeout(0.05)
-            
-            processing_start = self.env.now
-            wait_time = processing_start - start_time
-            
-            # Process the item
-            yield self.env.timeout(self.processing_time)
-            
-            processing_end = self.env.now
-            actual_processing_time = processing_end - processing_start
-            
-            self.items_processed += 1
-            self.total_processing_time += actual_processing_time
-            
-            self.logger.debug(f"{self.name} processed item {item_id} in {actual_processing_time:.2f}h "
-                            f"(wait: {wait_time:.2f}h) at time {self.env.now:.2f}")
-            
-            # Record processing event
-            self.data_collector.record_event('machine_processing', {
-                'machine': self.name,
-                'item_id': item_id,
-                'start_time': processing_start,
-                'end_time': processing_end,
-                'processing_time': actual_processing_time,
-                'wait_time': wait_time
-            })
+            yield from self.process_item_exclusive(item_id, start_time)
     
+    def process_item_exclusive(self, item_id: int, start_time: float = None):
+        """
+        Process a single item on a server the caller already owns.
+        
+        Fast path for workers that each own one server of the machine: run it
+        with `yield from` inside the worker, with no Resource request and no
+        child process. A breakdown interrupts the calling process.
+        """
+        if start_time is None:
+            start_time = self.env.now
+        
+        # Wait for the repair instead of polling if the machine is down
+        if self.is_broken:
+            self.order_logger.debug("%s is broken, waiting for repair...", self.name)
+            yield self.repaired
+        
+        processing_start = self.env.now
+        wait_time = processing_start - start_time
+        
+        # Process the item; a breakdown interrupts it and the remaining
+        # work resumes once the machine is repaired
+        remaining = self.processing_time
+        process = self.env.active_process
+        while remaining > 0:
+            segment_start = self.env.now
+            self.active_processes.add(process)
+            try:
+                yield self.env.timeout(remaining)
+                remaining = 0
+            except simpy.Interrupt:
+                remaining -= self.env.now - segment_start
+                yield self.repaired
+        self.active_processes.discard(process)
+        
+        processing_end = self.env.now
+        actual_processing_time = self.processing_time  # Busy time, excluding downtime
+        
+        self.items_processed += 1
+        self.total_processing_time += actual_processing_time
+        
+        self.order_logger.debug("%s processed item %s in %.2fh (wait: %.2fh) at time %.2f",
+                                self.name, item_id, actual_processing_time, wait_time, self.env.now)
+        
+        # Record processing event
+        self.data_collector.record_event('machine_processing', {
+            'machine': self.name,
+            'item_id': item_id,
+            'start_time': processing_start,
+            'end_time': processing_end,
+            'processing_time': actual_processing_time,
+            'wait_time': wait_time
+        })
+
     def failure_process(self):
         """Machine failure and repair process"""
         while True:
-            # Time until next failure (exponential distribution)
-            time_to_failure = random.expovariate(1.0 / self.mtbf)
+            # Time until next failure (exponential unless configured otherwise)
+            time_to_failure = self.time_to_failure()
             yield self.env.timeout(time_to_failure)
             
             # Machine breaks down
             if not self.is_broken:
                 self.is_broken = True
+                self.repaired = self.env.event()
                 failure_time = self.env.now
                 
-                self.logger.warning(f"{self.name} failed at time {failure_time:.2f}")
+                # Interrupt the items currently being processed, if any
+                for process in self.active_processes:
+                    process.interrupt('failure')
+                self.active_processes.clear()
+                
+                self.logger.warning("%s failed at time %.2f", self.name, failure_time)
                 
                 # Record failure event
                 self.data_collector.record_event('machine_failure', {
@@ -92,17 +131,18 @@ class ProductionMachine:
                     'failure_time': failure_time
                 })
                 
-                # Repair time (exponential distribution)
-                repair_time = random.expovariate(1.0 / self.mttr)
+                # Repair time (exponential unless configured otherwise)
+                repair_time = self.time_to_repair()
                 yield self.env.timeout(repair_time)
                 
                 # Machine is repaired
                 self.is_broken = False
+                self.repaired.succeed()
                 repair_complete_time = self.env.now
                 self.total_broken_time += repair_time
                 
-                self.logger.info(f"{self.name} repaired at time {repair_complete_time:.2f} "
-                               f"(downtime: {repair_time:.2f}h)")
+                self.logger.info("%s repaired at time %.2f (downtime: %.2fh)",
+                                 self.name, repair_complete_time, repair_time)
                 
                 # Record repair event
                 self.data_collector.record_event('machine_repair', {
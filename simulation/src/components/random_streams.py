@@ -0,0 +1,151 @@
+"""
+Random Streams - Independent, reproducible random-number streams per stochastic source
+"""
+
+import math
+import zlib
+import numpy as np
+from typing import Any, Optional, Union
+
+DISTRIBUTIONS = ('exponential', 'lognormal', 'weibull', 'empirical', 'uniform')
+MIN_BLOCK_SIZE = 64
+MAX_BLOCK_SIZE = 8192
+
+def normalize_distribution(spec: Union[float, int, dict, None]) -> dict:
+    """
+    Distribution spec as a dict with a 'distribution' key.
+    
+    A plain number is the mean of an exponential distribution (the format of
+    the config files), None is the uniform distribution on [0, 1).
+    """
+    if spec is None:
+        return {'distribution': 'uniform'}
+    if isinstance(spec, (int, float)):
+        return {'distribution': 'exponential', 'mean': spec}
+    spec = dict(spec)
+    spec.setdefault('distribution', 'exponential')
+    if spec['distribution'] not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{spec['distribution']}', expected one of {DISTRIBUTIONS}")
+    return spec
+
+def distribution_mean(spec: Union[float, int, dict]) -> float:
+    """Mean of a distribution spec"""
+    spec = normalize_distribution(spec)
+    if spec['distribution'] == 'uniform':
+        return 0.5
+    if spec['distribution'] == 'empirical':
+        return float(np.mean(spec['values']))
+    if spec['distribution'] == 'weibull' and 'mean' not in spec:
+        return spec['scale'] * math.gamma(1.0 + 1.0 / spec['shape'])
+    return spec['mean']
+
+class BlockSampler:
+    """
+    Variates of one distribution from one stream, drawn a block at a time.
+    
+    Each refill draws a whole block with NumPy and converts it to Python floats
+    once; calling the sampler then only steps an iterator. Blocks start small
+    (a source used a few times per run wastes little) and double up to
+    MAX_BLOCK_SIZE.
+    
+    Supported specs (see normalize_distribution):
+        {distribution: exponential, mean}
+        {distribution: lognormal, mean, cv}            (cv = std / mean)
+        {distribution: weibull, shape, mean | scale}
+        {distribution: empirical, values}               (resamples the values)
+        {distribution: uniform}                         (on [0, 1))
+    
+    Antithetic streams mirror every variate: inversion-based ones use 1 - U,
+    lognormal uses -Z for its underlying standard normal.
+    """
+    
+    def __init__(self, generator: np.random.Generator, spec: Union[float, int, dict, None],
+                 antithetic: bool = False):
+        self.generator = generator
+        self.spec = normalize_distribution(spec)
+        self.antithetic = antithetic
+        self.block_size = MIN_BLOCK_SIZE
+        self._transform = self._build_transform(self.spec)
+        self._values = iter(())
+    
+    @staticmethod
+    def _build_transform(spec: dict):
+        """Vectorized map from a block of uniforms (or normals, for lognormal) to variates"""
+        kind = spec['distribution']
+        if kind == 'uniform':
+            return lambda u: u
+        if kind == 'exponential':
+            mean = spec['mean']
+            return lambda u: -mean * np.log1p(-u)
+        if kind == 'weibull':
+            shape = spec['shape']
+            scale = spec.get('scale')
+            if scale is None:
+                scale = spec['mean'] / math.gamma(1.0 + 1.0 / shape)
+            return lambda u: scale * (-np.log1p(-u)) ** (1.0 / shape)
+        if kind == 'lognormal':
+            # Parameters of the underlying normal from the mean and coefficient of variation
+            sigma2 = math.log1p(spec.get('cv', 1.0) ** 2)
+            mu = math.log(spec['mean']) - sigma2 / 2.0
+            sigma = math.sqrt(sigma2)
+            return lambda z: np.exp(mu + sigma * z)
+        values = np.sort(np.asarray(spec['values'], dtype=float))
+        if not len(values):
+            raise ValueError("Empirical distribution needs at least one value")
+        return lambda u: values[np.minimum((u * len(values)).astype(np.int64), len(values) - 1)]
+    
+    def _refill(self):
+        size = self.block_size
+        if self.spec['distribution'] == 'lognormal':
+            draws = self.generator.standard_normal(size)
+            if self.antithetic:
+                draws = -draws
+        else:
+            draws = self.generator.random(size)
+            if self.antithetic:
+                draws = 1.0 - draws
+                draws[draws >= 1.0] = 0.0  # Keep the uniforms in [0, 1)
+        self._values = iter(self._transform(draws).tolist())
+        self.block_size = min(2 * size, MAX_BLOCK_SIZE)
+    
+    def __call__(self) -> float:
+        """Next variate"""
+        try:
+            return next(self._values)
+        except StopIteration:
+            self._refill()
+            return next(self._values)
+    
+    def with_distribution(self, spec: Union[float, int, dict, None]) -> 'BlockSampler':
+        """Sampler of another distribution that continues this one's stream"""
+        return BlockSampler(self.generator, spec, self.antithetic)
+    
+    @property
+    def mean(self) -> float:
+        return distribution_mean(self.spec)
+
+class RandomStreams:
+    """
+    Factory of named streams derived from one seed with SeedSequence.
+    
+    A stream depends only on the seed, the replication index and its own name
+    (hashed into the spawn key), never on which other streams exist or how many
+    numbers they draw. Runs of two configs with the same seed therefore use
+    common random numbers: a machine fails at the same times whatever the buffer
+    sizes are.
+    """
+    
+    def __init__(self, seed: Optional[int], replication: int = 0, antithetic: bool = False):
+        self.seed = seed
+        self.replication = replication
+        self.antithetic = antithetic
+    
+    def generator(self, name: str) -> np.random.Generator:
+        """The NumPy generator of one stochastic source, e.g. 'Machine A/failure'"""
+        seed_sequence = np.random.SeedSequence(self.seed,
+                                               spawn_key=(self.replication, zlib.crc32(name.encode())))
+        return np.random.Generator(np.random.PCG64(seed_sequence))
+    
+    def sampler(self, name: str, spec: Any = None) -> BlockSampler:
+        """Block sampler of a source's distribution (uniform if spec is None)"""
+        return BlockSampler(self.generator(name), spec, self.antithetic)
@@ -5,6 +5,7 @@ Parts Warehouse Component
 import simpy
 import logging
 from typing import Any
+from components.buffers import TrackedContainer
 
 class PartsWarehouse:
     """Parts warehouse with replenishment logic"""
@@ -18,16 +19,13 @@ class PartsWarehouse:
         self.replenishment_quantity = replenishment_quantity
         self.data_collector = data_collector
         self.logger = logging.getLogger(__name__)
+        self.order_logger = logging.getLogger(f'{__name__}.orders')
         
-        # Create container for parts
-        self.parts = simpy.Container(env, capacity=capacity, init=initial_parts)
+        # Create container for parts (reports every level change)
+        self.parts = TrackedContainer(env, 'warehouse_level', data_collector,
+                                      capacity=capacity, init=initial_parts)
         
-        self.logger.info(f"Warehouse initialized with {initial_parts} parts (capacity: {capacity})")
-        self._record_level()
-    
-    def _record_level(self):
-        """Record current inventory level"""
-        self.data_collector.record_metric('warehouse_level', self.parts.level, self.env.now)
+        self.logger.info("Warehouse initialized with %d parts (capacity: %d)", initial_parts, capacity)
     
     def get_parts(self, quantity: int):
         """Get parts from warehouse"""
@@ -39,8 +37,8 @@ class PartsWarehouse:
         wait_time = self.env.now - start_time
         current_level = self.parts.level
         
-        self.logger.debug(f"Retrieved {quantity} parts at time {self.env.now:.2f} "
-                         f"(wait: {wait_time:.2f}h, remaining: {current_level})")
+        self.order_logger.debug("Retrieved %d parts at time %.2f (wait: %.2fh, remaining: %s)",
+                                quantity, self.env.now, wait_time, current_level)
         
         # Record warehouse event
         self.data_collector.record_event('warehouse_get', {
@@ -49,7 +47,6 @@ class PartsWarehouse:
             'wait_time': wait_time,
             'remaining_parts': current_level
         })
-        self._record_level()
     
     def replenishment_process(self):
         """Periodic replenishment of warehouse"""
@@ -66,8 +63,8 @@ class PartsWarehouse:
                 yield self.parts.put(parts_to_add)
                 new_level = self.parts.level
                 
-                self.logger.info(f"Warehouse replenished with {parts_to_add} parts at time {self.env.now:.2f} "
-                               f"(level: {current_level} -> {new_level})")
+                self.logger.info("Warehouse replenished with %d parts at time %.2f (level: %s -> %s)",
+                                 parts_to_add, self.env.now, current_level, new_level)
                 
                 # Record replenishment event
                 self.data_collector.record_event('warehouse_replenishment', {
@@ -75,6 +72,5 @@ class PartsWarehouse:
                     'parts_added': parts_to_add,
                     'new_level': new_level
                 })
-                self._record_level()
             else:
-                self.logger.warning(f"Warehouse full at replenishment time {self.env.now:.2f}")
\ No newline at end of file
+                self.logger.warning("Warehouse full at replenishment time %.2f", self.env.now)
\ No newline at end of file
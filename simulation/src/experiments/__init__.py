@@ -0,0 +1 @@
+# Experiments package
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""
+Benchmark Suite - Engine speed and memory on standard scenarios, checked against a stored baseline
+"""
+
+import io
+import os
+import sys
+import copy
+import json
+import time
+import resource
+import platform
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+import simpy
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Callable
+from experiments.replication import init_worker
+
+DEFAULT_BASELINE_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks', 'baseline.json'))
+DEFAULT_TOLERANCE = 0.25
+MAIN_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'main.py'))
+
+# Modules the headless `simulate` command must not import
+HEADLESS_FORBIDDEN_MODULES = ('pandas', 'matplotlib')
+
+# Metrics compared against the baseline and whether higher values are better.
+# Orders per CPU-second measures useful work, so it also credits changes that
+# need fewer SimPy events per order (which lowers events per second).
+BENCHMARK_METRICS = {
+    'orders_per_cpu_second': True,
+    'events_per_second': True,
+    'simulate_seconds': False,
+    'report_seconds': False,
+    'simulate_peak_rss_mb': False,
+    'peak_rss_mb': False,
+    'startup_seconds': False
+}
+
+def _one_year(config: Dict[str, Any]) -> Dict[str, Any]:
+    config['simulation']['duration_hours'] = 24 * 365
+    return config
+
+def _high_arrival(config: Dict[str, Any]) -> Dict[str, Any]:
+    # 10 orders/hour, above the ~8.5/hour capacity of Machine B: queues keep growing
+    config['order_arrival']['interarrival_time_hours'] = 0.1
+    return config
+
+def _ten_machines(config: Dict[str, Any]) -> Dict[str, Any]:
+    line = config['production_line']
+    base_machines = line['machines']
+    labels = [chr(ord('A') + i) for i in range(10)]
+    line['machines'] = [dict(base_machines[i % len(base_machines)], name=f'Machine {label}')
+                        for i, label in enumerate(labels)]
+    for upstream, downstream in zip(labels, labels[1:]):
+        line[f'buffer_{upstream}_{downstream}_size'] = line.get(f'buffer_{upstream}_{downstream}_size', 5)
+    return config
+
+# Scenario name -> (config file, transformation applied to a copy of it)
+SCENARIOS = {
+    'baseline': ('config.yaml', None),
+    'optimized': ('config_optimized.yaml', None),
+    'one_year': ('config.yaml', _one_year),
+    'high_arrival': ('config.yaml', _high_arrival),
+    'ten_machines': ('config.yaml', _ten_machines)
+}
+
+def build_scenarios(configs: Dict[str, Dict[str, Any]],
+                    names: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Scenario configs from the loaded config files (keyed by file name)"""
+    names = names or list(SCENARIOS)
+    scenarios = {}
+    for name in names:
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}', expected one of {list(SCENARIOS)}")
+        config_file, transform = SCENARIOS[name]
+        config = copy.deepcopy(configs[config_file])
+        scenarios[name] = transform(config) if transform else config
+    return scenarios
+
+class CountingEnvironment(simpy.Environment):
+    """SimPy environment that counts the events it processes"""
+    
+    def __init__(self, initial_time: float = 0):
+        super().__init__(initial_time)
+        self.processed_events = 0
+    
+    def step(self):
+        super().step()
+        self.processed_events += 1
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KiB on Linux
+
+def run_scenario(config: Dict[str, Any], report: bool = True) -> Dict[str, float]:
+    """
+    Run one scenario and measure it (call in a fresh process).
+    
+    Events per second counts the SimPy events processed by env.run, through
+    a CountingEnvironment (its per-event call is part of the timings); the
+    report is generated into a temporary directory. Peak RSS is taken after
+    the simulation and again after the report (plotting libraries dominate it).
+    """
+    from simulation import FactorySimulation
+    
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    factory = FactorySimulation(config, env=CountingEnvironment())
+    factory.simulate()
+    cpu_seconds = time.process_time() - cpu_start
+    simulate_seconds = time.perf_counter() - start
+    
+    events = factory.env.processed_events
+    completions = factory.data_collector.events.tables.get('order_completed')
+    orders = completions.size if completions is not None else 0
+    simulate_peak_rss_mb = _peak_rss_mb()
+    
+    report_seconds = 0.0
+    if report:
+        from analysis.reporting import generate_report
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            os.chdir(directory)
+            try:
+                start = time.perf_counter()
+                generate_report(factory.data_collector.get_results(), config)
+                report_seconds = time.perf_counter() - start
+            finally:
+                os.chdir(cwd)
+    
+    return {
+        'events': events,
+        'orders': orders,
+        'simulate_seconds': simulate_seconds,
+        'events_per_second': events / simulate_seconds,
+        'orders_per_cpu_second': orders / cpu_seconds,
+        'report_seconds': report_seconds,
+        'simulate_peak_rss_mb': simulate_peak_rss_mb,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+def measure_startup(repeat: int = 3) -> Dict[str, Any]:
+    """
+    Startup cost of the headless entry point, in fresh interpreters.
+    
+    `main.py simulate --help` imports everything a KPI-only run needs and
+    stops before simulating; the fastest of `repeat` runs is kept. One more
+    run with -X importtime lists the forbidden heavy modules it imported.
+    """
+    command = [sys.executable, MAIN_PATH, 'simulate', '--help']
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    
+    trace = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    imported = {line.rsplit('|', 1)[-1].strip() for line in trace.splitlines() if line.startswith('import time:')}
+    return {
+        'startup_seconds': min(timings),
+        'heavy_modules': [module for module in HEADLESS_FORBIDDEN_MODULES if module in imported]
+    }
+
+def run_benchmarks(scenarios: Dict[str, Dict[str, Any]], repeat: int = 3, report: bool = True,
+                   progress: Callable[[str, Dict[str, float]], None] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Run every scenario `repeat` times, each run in a fresh spawned process.
+    
+    The fastest run is kept for the timings and the largest peak RSS for memory.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name, config in scenarios.items():
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=init_worker) as executor:
+                runs.append(executor.submit(run_scenario, config, report).result())
+        
+        best = min(runs, key=lambda run: run['simulate_seconds'])
+        results[name] = dict(best,
+                             orders_per_cpu_second=max(run['orders_per_cpu_second'] for run in runs),
+                             report_seconds=min(run['report_seconds'] for run in runs),
+                             simulate_peak_rss_mb=max(run['simulate_peak_rss_mb'] for run in runs),
+                             peak_rss_mb=max(run['peak_rss_mb'] for run in runs))
+        if progress:
+            progress(name, results[name])
+    return results
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any],
+                        tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Descriptions of every metric more than `tolerance` (relative) worse than the baseline"""
+    regressions = []
+    for name, metrics in results.items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_better in BENCHMARK_METRICS.items():
+            expected = reference.get(metric)
+            actual = metrics.get(metric)
+            if not expected or actual is None:
+                continue
+            change = (actual - expected) / expected
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}: {metric} {actual:.4g} vs baseline {expected:.4g} "
+                                   f"({change:+.1%})")
+        for module in metrics.get('heavy_modules', []):
+            regressions.append(f"{name}: the headless entry point imports {module}")
+    return regressions
+
+def load_baseline(path: str = DEFAULT_BASELINE_PATH) -> Optional[Dict[str, Any]]:
+    """Stored baseline, or None if there is none yet"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_baseline(results: Dict[str, Dict[str, float]], path: str = DEFAULT_BASELINE_PATH):
+    """Store results as the new baseline, with the machine they were measured on"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    baseline = {
+        'machine': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'processor': platform.machine()
+        },
+        'scenarios': results
+    }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
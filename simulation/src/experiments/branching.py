@@ -0,0 +1,224 @@
+"""
+Snapshot Branching - Warm a simulation up once and continue what-if branches from it
+"""
+
+import os
+import sys
+import copy
+import pickle
+import logging
+from collections import deque
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from simulation import FactorySimulation, buffer_size
+from experiments.parameters import split_path
+
+# Dotted config paths that can change in a running simulation, by their parent section
+LIVE_PARAMETERS = {
+    ('order_arrival',): ('interarrival_time_hours',),
+    ('parts_warehouse',): ('capacity', 'replenishment_interval_hours', 'replenishment_quantity'),
+    ('production_line', 'machines'): ('processing_time_minutes', 'mtbf_hours', 'mttr_hours'),
+    ('finished_storage',): ('capacity',),
+    ('logistics',): ('lorry_capacity', 'round_trip_hours', 'max_wait_hours'),
+    ('logistics', 'driver'): ('car_issue_prob', 'issue_delay_hours')
+}
+
+def check_live_parameter(path: str):
+    """Raise ValueError unless a parameter can be changed in a running simulation"""
+    keys = split_path(path)
+    if keys[0] == 'production_line' and len(keys) == 2 and str(keys[1]).endswith('_size'):
+        return
+    if len(keys) == 4 and keys[:2] == ['production_line', 'machines'] and isinstance(keys[2], int):
+        keys = keys[:2] + keys[3:]
+    if keys[-1] not in LIVE_PARAMETERS.get(tuple(keys[:-1]), ()):
+        raise ValueError(f"Parameter '{path}' cannot be changed in a running simulation "
+                         f"(the structure of the line and the initial state are fixed)")
+
+def apply_live_parameters(factory: FactorySimulation, parameters: Dict[str, Any]):
+    """
+    Change parameters of a started simulation, given as dotted config paths.
+    
+    The config is updated and the components pick the new values up from
+    their next operation on: capacities change at once, processing times from
+    the next item, distributions from the next draw (continuing the same
+    random stream). Timeouts already running, e.g. the time to the next
+    failure, keep their drawn length.
+    """
+    for path, value in parameters.items():
+        check_live_parameter(path)
+        keys = split_path(path)
+        section = factory.config
+        for key in keys[:-1]:
+            section = section[key]
+        section[keys[-1]] = value
+        
+        if keys[0] == 'order_arrival':
+            factory.interarrival_time = factory.interarrival_time.with_distribution(value)
+        elif keys[0] == 'parts_warehouse':
+            warehouse = factory.warehouse
+            if keys[1] == 'capacity':
+                warehouse.capacity = value
+                warehouse.parts.resize(value)
+            elif keys[1] == 'replenishment_interval_hours':
+                warehouse.replenishment_interval = value
+            else:
+                warehouse.replenishment_quantity = value
+        elif keys[0] == 'production_line' and keys[1] == 'machines':
+            for machine in factory.stages[keys[2]]:
+                if keys[3] == 'processing_time_minutes':
+                    machine.processing_time = value / 60.0
+                elif keys[3] == 'mtbf_hours':
+                    machine.mtbf = value
+                    machine.time_to_failure = machine.time_to_failure.with_distribution(value)
+                else:
+                    machine.mttr = value
+                    machine.time_to_repair = machine.time_to_repair.with_distribution(value)
+        elif keys[0] == 'production_line':
+            # A buffer size, or the default size of every buffer without its own
+            for buffer in factory.buffers:
+                buffer.resize(buffer_size(factory.config['production_line'], buffer.name[:-len('_level')]))
+        elif keys[0] == 'finished_storage':
+            factory.finished_storage.resize(value)
+        else:
+            driver = factory.lorry_driver
+            if keys[-1] == 'lorry_capacity':
+                driver.capacity = value
+            elif keys[-1] == 'round_trip_hours':
+                driver.round_trip = value
+            elif keys[-1] == 'max_wait_hours':
+                driver.max_wait = value
+            elif keys[-1] == 'car_issue_prob':
+                driver.car_issue_prob = value
+            else:
+                driver.issue_delay = value
+                driver.issue_delay_time = driver.issue_delay_time.with_distribution(value)
+
+class Snapshot:
+    """
+    A simulation run up to `time` hours, from which what-if branches continue.
+    
+    The shared prefix (e.g. the warm-up of the plant) runs once. Branches run
+    in forked child processes, which start from an exact copy of the
+    snapshot's memory: buffers, warehouse, broken machines and pending
+    repairs, lorries, collector and random stream positions. Branches
+    therefore use common random numbers from the snapshot on.
+    
+    SimPy processes are generators, which can be neither copied nor
+    pickled, so a snapshot cannot be duplicated inside one process or sent to
+    a spawned worker. Without os.fork (Windows) and for branch() the prefix is
+    replayed instead; every random stream depends only on the seed and its
+    name, so the replay reaches the identical state.
+    
+    Unless the config sets warmup_hours, the branches' KPIs start at the
+    snapshot time.
+    """
+    
+    def __init__(self, config: Dict[str, Any], time: float):
+        config = copy.deepcopy(config)
+        sim_config = config['simulation']
+        if not 0 < time < sim_config['duration_hours']:
+            raise ValueError(f"Snapshot time must be in (0, duration_hours), got {time}")
+        sim_config.setdefault('warmup_hours', time)
+        sim_config['logging_mode'] = 'standard'  # A listener thread does not survive a fork
+        sim_config.pop('spill_dir', None)  # Neither does the spill writer thread
+        
+        self.config = config
+        self.time = time
+        self.factory = self._warm_up()
+    
+    def _warm_up(self) -> FactorySimulation:
+        factory = FactorySimulation(copy.deepcopy(self.config))
+        factory.start()
+        factory.advance(self.time)
+        return factory
+    
+    def branch(self, parameters: Optional[Dict[str, Any]] = None) -> FactorySimulation:
+        """A new simulation in the snapshot's state (replayed) with the parameters applied"""
+        factory = self._warm_up()
+        apply_live_parameters(factory, parameters or {})
+        return factory
+    
+    def _finish(self, factory: FactorySimulation, parameters: Dict[str, Any]) -> Dict[str, float]:
+        """Run a branch to the end of the configured duration and return its KPIs"""
+        apply_live_parameters(factory, parameters)
+        try:
+            factory.advance(self.config['simulation']['duration_hours'])
+        finally:
+            factory.close()
+        return {name: float(value) for name, value in factory.data_collector.calculate_kpis().items()}
+    
+    def _fork(self, parameters: Dict[str, Any]) -> Tuple[int, int]:
+        """Start a branch in a child process; returns its pid and the read end of its result pipe"""
+        sys.stdout.flush()
+        sys.stderr.flush()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(write_fd)
+            return pid, read_fd
+        
+        # Child: finish the branch on the inherited state, send back the KPIs and
+        # exit without ever returning into the parent's code
+        status = 0
+        try:
+            os.close(read_fd)
+            logging.getLogger().setLevel(logging.ERROR)
+            try:
+                payload = pickle.dumps(self._finish(self.factory, parameters))
+            except BaseException as error:
+                status = 1
+                payload = pickle.dumps(RuntimeError(f"Branch {parameters} failed: {error!r}"))
+            with os.fdopen(write_fd, 'wb') as pipe:
+                pipe.write(payload)
+        finally:
+            os._exit(status)
+    
+    @staticmethod
+    def _collect(pid: int, read_fd: int) -> Dict[str, float]:
+        """Read a child's result and reap it"""
+        with os.fdopen(read_fd, 'rb') as pipe:
+            payload = pipe.read()
+        os.waitpid(pid, 0)
+        if not payload:
+            raise RuntimeError(f"Branch process {pid} exited without a result")
+        result = pickle.loads(payload)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+    
+    def iter_branches(self, branches: List[Dict[str, Any]],
+                      workers: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, float]]]:
+        """Run every branch (parameters per branch) and yield (index, KPIs) in order"""
+        for parameters in branches:
+            for path in parameters:
+                check_live_parameter(path)
+        
+        if not hasattr(os, 'fork'):
+            for index, parameters in enumerate(branches):
+                yield index, self._finish(self._warm_up(), parameters)
+            return
+        
+        # At most `workers` children at a time, collected in order
+        workers = min(workers or os.cpu_count() or 1, max(len(branches), 1))
+        pending = deque()
+        try:
+            for index, parameters in enumerate(branches):
+                if len(pending) == workers:
+                    done, pid, read_fd = pending.popleft()
+                    yield done, self._collect(pid, read_fd)
+                pending.append((index, *self._fork(parameters)))
+            while pending:
+                done, pid, read_fd = pending.popleft()
+                yield done, self._collect(pid, read_fd)
+        finally:
+            # Stopped early (error or generator closed): reap the children still running
+            for _, pid, read_fd in pending:
+                os.close(read_fd)
+                os.waitpid(pid, 0)
+    
+    def run_branches(self, branches: List[Dict[str, Any]], workers: Optional[int] = None) -> List[Dict[str, float]]:
+        """KPIs of every branch, in the order of the branches"""
+        return [kpis for _, kpis in self.iter_branches(branches, workers)]
+    
+    def close(self):
+        """Release the snapshot's own simulation"""
+        self.factory.close()
@@ -0,0 +1,160 @@
+"""
+Result Cache - Finished runs stored on disk under a hash of their config and the simulator code
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numbers
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, Optional
+
+if TYPE_CHECKING:
+    from analysis.results import SimulationResults
+
+logger = logging.getLogger(__name__)
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINGERPRINT_PATHS = ('simulation.py', 'components', 'analysis')  # The code that decides a run's KPIs
+
+# Simulation settings that change how a run is logged, stored or reported, not its results
+NON_MODEL_SETTINGS = ('logging_mode', 'log_level', 'log_orders', 'export_csv', 'draft_plots',
+                      'spill_dir', 'spill_chunk_events', 'cache_dir', 'cache_max_mb')
+
+DEFAULT_MAX_MB = 1024
+KPI_FILE = 'kpis.json'
+DATA_DIR = 'data'
+
+@lru_cache(maxsize=1)
+def source_fingerprint() -> str:
+    """SHA-256 of the simulator's source, so that changing the model invalidates every entry"""
+    digest = hashlib.sha256()
+    for path in FINGERPRINT_PATHS:
+        full_path = os.path.join(SRC_DIR, path)
+        if os.path.isfile(full_path):
+            files = [full_path]
+        else:
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(full_path)
+                           for name in names if name.endswith('.py'))
+        for file in files:
+            digest.update(os.path.relpath(file, SRC_DIR).encode())
+            with open(file, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+def _normalize(value: Any) -> Any:
+    """Config value in canonical form: string keys, lists for tuples, every number as a float"""
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, numbers.Real):
+        return float(value)  # 5 and 5.0 (or a NumPy number from a sweep) give the same run
+    return str(value)
+
+def config_key(config: Dict[str, Any]) -> str:
+    """Cache key of a run: the normalized config (random_seed included) and the source fingerprint"""
+    normalized = _normalize(config)
+    for name in NON_MODEL_SETTINGS:
+        normalized['simulation'].pop(name, None)
+    payload = json.dumps({'config': normalized, 'code': source_fingerprint()}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResultCache:
+    """
+    Content-addressed store of finished runs under directory/<key>/.
+    
+    An entry holds the run's KPIs (kpis.json) and, if stored with its results,
+    the event data in the save_results() format (data/). Entries are written
+    to a temporary directory and renamed into place, so parallel workers can
+    share a cache. Reading an entry marks it used; beyond max_bytes the
+    least recently used entries are removed.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_MB * 2 ** 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['ResultCache']:
+        """Cache set by simulation.cache_dir (and cache_max_mb), or None"""
+        sim_config = config['simulation']
+        directory = sim_config.get('cache_dir')
+        if directory is None:
+            return None
+        return cls(directory, int(sim_config.get('cache_max_mb', DEFAULT_MAX_MB) * 2 ** 20))
+    
+    def _entry(self, config: Dict[str, Any]) -> str:
+        return os.path.join(self.directory, config_key(config))
+    
+    def get_kpis(self, config: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        """KPIs of a cached run of this config, or None"""
+        path = os.path.join(self._entry(config), KPI_FILE)
+        try:
+            with open(path, 'r') as f:
+                kpis = json.load(f)
+            os.utime(path)  # Most recently used
+        except (OSError, ValueError):
+            return None
+        return kpis
+    
+    def get_data(self, config: Dict[str, Any]) -> Optional[str]:
+        """Directory of the cached event data of this config (for load_results), or None"""
+        from analysis.storage import MANIFEST_NAME
+        entry = self._entry(config)
+        if not os.path.exists(os.path.join(entry, DATA_DIR, MANIFEST_NAME)):
+            return None
+        try:
+            os.utime(os.path.join(entry, KPI_FILE))
+        except OSError:
+            return None  # Evicted meanwhile
+        return os.path.join(entry, DATA_DIR)
+    
+    def put(self, config: Dict[str, Any], kpis: Dict[str, float], results: Optional['SimulationResults'] = None):
+        """Store the KPIs of a run of this config, with its event data if results are given"""
+        entry = self._entry(config)
+        staging = os.path.join(self.directory, f'.{os.path.basename(entry)}.{os.getpid()}')
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        if results is not None:
+            from analysis.storage import save_results
+            save_results(results, config, os.path.join(staging, DATA_DIR))
+        with open(os.path.join(staging, KPI_FILE), 'w') as f:
+            json.dump({name: float(value) for name, value in kpis.items()}, f, indent=2)
+        
+        if results is not None:
+            shutil.rmtree(entry, ignore_errors=True)  # A KPI-only entry is replaced
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)  # Another process stored the same run first
+        self.evict()
+    
+    def _keys(self) -> list:
+        return [name for name in os.listdir(self.directory) if not name.startswith('.')]
+    
+    @staticmethod
+    def _entry_size(entry: str) -> int:
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(entry) for name in names)
+    
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for key in self._keys():
+            entry = os.path.join(self.directory, key)
+            try:
+                entries.append((os.path.getmtime(os.path.join(entry, KPI_FILE)), self._entry_size(entry), entry))
+            except OSError:
+                continue  # Removed by another process
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            logger.debug("Evicted %s from the result cache", entry)
@@ -0,0 +1,213 @@
+"""
+Config Optimizer - Successive halving search over the modifiable parameters
+"""
+
+import os
+import math
+import json
+import yaml
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional
+from experiments.parameters import apply_parameters, generate_points, get_parameter
+from experiments.replication import run_replication, init_worker
+from experiments.screening import estimate_candidates
+
+# Default search space over the MODIFIABLE parameters. Processing times are
+# left out: shorter is always better, so the search would just pick the minimum.
+DEFAULT_SEARCH_SPACE = {
+    'parts_warehouse.initial_parts': {'low': 100, 'high': 500, 'type': 'int'},
+    'parts_warehouse.replenishment_interval_hours': {'low': 4, 'high': 24, 'type': 'float'},
+    'parts_warehouse.replenishment_quantity': {'low': 50, 'high': 400, 'type': 'int'},
+    'production_line.buffer_A_B_size': {'low': 1, 'high': 30, 'type': 'int'},
+    'production_line.buffer_B_C_size': {'low': 1, 'high': 30, 'type': 'int'},
+    'finished_storage.capacity': {'low': 20, 'high': 100, 'type': 'int'},
+    'logistics.lorry_capacity': {'low': 5, 'high': 40, 'type': 'int'}
+}
+
+def pareto_ranks(objectives: List[tuple]) -> List[int]:
+    """Non-dominated sorting rank (0 = Pareto front) of (throughput, lead time) pairs"""
+    def dominates(a, b):
+        # Higher throughput and lower lead time are better
+        return a[0] >= b[0] and a[1] <= b[1] and (a[0] > b[0] or a[1] < b[1])
+    
+    ranks = [None] * len(objectives)
+    remaining = set(range(len(objectives)))
+    rank = 0
+    while remaining:
+        front = {i for i in remaining
+                 if not any(dominates(objectives[j], objectives[i]) for j in remaining if j != i)}
+        for i in front:
+            ranks[i] = rank
+        remaining -= front
+        rank += 1
+    return ranks
+
+class SuccessiveHalvingOptimizer:
+    """
+    Searches config parameters for high throughput and low lead time.
+    
+    All candidates start on short, few-seed runs. After each rung only the best
+    1/eta (by Pareto rank, then by summed throughput and lead time ranks) move on
+    to a rung with eta times the horizon and more seeds. Only the last rung uses
+    the full duration and seed count of the config.
+    
+    With screen > 1, screen times as many points are sampled and ranked the
+    same way by their analytical KPI estimates (FactoryApproximation), and
+    only the best are simulated as candidates.
+    """
+    
+    def __init__(self, base_config: Dict[str, Any], search_space: Optional[Dict[str, Any]] = None,
+                 candidates: int = 27, eta: int = 3, rungs: int = 3, seeds: int = 5,
+                 min_seeds: int = 2, sampling_seed: int = 0, screen: int = 1):
+        if eta < 2:
+            raise ValueError(f"eta must be at least 2, got {eta}")
+        if rungs < 1:
+            raise ValueError(f"Number of rungs must be positive, got {rungs}")
+        if screen < 1:
+            raise ValueError(f"screen must be at least 1, got {screen}")
+        
+        self.base_config = base_config
+        self.search_space = search_space or DEFAULT_SEARCH_SPACE
+        self.eta = eta
+        self.rungs = rungs
+        self.seeds = seeds
+        self.min_seeds = min(min_seeds, seeds)
+        
+        # Every rung has to run past a fixed warm-up, or its runs would fail in the workers
+        warmup = base_config['simulation'].get('warmup_hours', 0.0)
+        if warmup != 'auto':
+            for rung in range(rungs):
+                duration, _ = self.rung_budget(rung)
+                if not 0 <= warmup < duration:
+                    raise ValueError(f"warmup_hours {warmup} leaves no measured time in rung {rung + 1} "
+                                     f"({duration:.1f}h runs)")
+        
+        # The unmodified config competes as candidate 0
+        baseline = {path: get_parameter(base_config, path) for path in self.search_space}
+        points = generate_points(self.search_space, 'lhs', screen * (candidates - 1), sampling_seed)
+        self.screened = len(points) if screen > 1 else 0
+        if screen > 1:
+            points = self._screen(points, candidates - 1)
+        self.candidates = [baseline] + points
+        self.history = []
+    
+    def _screen(self, points: List[Dict[str, Any]], keep: int) -> List[Dict[str, Any]]:
+        """The `keep` points with the best analytical KPI estimates"""
+        estimates = estimate_candidates(self.base_config, points)
+        scores = {i: {'throughput_orders_per_hour': kpis['throughput_orders_per_hour'],
+                      'average_lead_time_hours': kpis['average_lead_time_hours']}
+                  for i, kpis in enumerate(estimates)}
+        return [points[i] for i in self._rank(scores)[:keep]]
+    
+    def rung_budget(self, rung: int) -> tuple:
+        """
+        (duration_hours, seeds) for a rung; the last rung gets the full budget.
+        
+        Only the measured part of a run shrinks: a fixed warm-up is simulated
+        in full on every rung ('auto' is detected in each run, whatever its length).
+        """
+        shrink = self.eta ** (self.rungs - 1 - rung)
+        sim_config = self.base_config['simulation']
+        warmup = sim_config.get('warmup_hours', 0.0)
+        if warmup == 'auto':
+            warmup = 0.0
+        duration = warmup + (sim_config['duration_hours'] - warmup) / shrink
+        seeds = max(self.min_seeds, math.ceil(self.seeds / shrink))
+        return duration, seeds
+    
+    def _evaluate(self, candidate_ids: List[int], duration: float, seeds: int,
+                  executor: ProcessPoolExecutor) -> Dict[int, Dict[str, float]]:
+        """Mean throughput and lead time of each candidate over `seeds` replications"""
+        base_seed = self.base_config['simulation']['random_seed']
+        jobs = []
+        for candidate_id in candidate_ids:
+            config = apply_parameters(self.base_config, self.candidates[candidate_id])
+            config['simulation']['duration_hours'] = duration
+            for i in range(seeds):
+                jobs.append((candidate_id, executor.submit(run_replication, config, base_seed + i)))
+        
+        samples = {candidate_id: [] for candidate_id in candidate_ids}
+        for candidate_id, future in jobs:
+            samples[candidate_id].append(future.result())
+        
+        scores = {}
+        for candidate_id, kpi_list in samples.items():
+            throughputs = [kpis.get('throughput_orders_per_hour', 0.0) for kpis in kpi_list]
+            lead_times = [kpis.get('average_lead_time_hours', math.inf) for kpis in kpi_list]
+            scores[candidate_id] = {
+                'throughput_orders_per_hour': sum(throughputs) / len(throughputs),
+                'average_lead_time_hours': sum(lead_times) / len(lead_times)
+            }
+        return scores
+    
+    def _rank(self, scores: Dict[int, Dict[str, float]]) -> List[int]:
+        """Candidate ids ordered best first"""
+        ids = list(scores)
+        objectives = [(scores[i]['throughput_orders_per_hour'], scores[i]['average_lead_time_hours'])
+                      for i in ids]
+        fronts = pareto_ranks(objectives)
+        
+        # Break ties within a front by the sum of per-objective ranks (scale-free)
+        by_throughput = sorted(ids, key=lambda i: -scores[i]['throughput_orders_per_hour'])
+        by_lead_time = sorted(ids, key=lambda i: scores[i]['average_lead_time_hours'])
+        rank_sum = {i: by_throughput.index(i) + by_lead_time.index(i) for i in ids}
+        
+        order = sorted(range(len(ids)), key=lambda k: (fronts[k], rank_sum[ids[k]]))
+        return [ids[k] for k in order]
+    
+    def run(self, workers: Optional[int] = None) -> Dict[str, Any]:
+        """Run all rungs and return the best candidate and the search history"""
+        survivors = list(range(len(self.candidates)))
+        simulated_hours = 0.0
+        workers = workers or os.cpu_count() or 1
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            for rung in range(self.rungs):
+                duration, seeds = self.rung_budget(rung)
+                print(f"Rung {rung + 1}/{self.rungs}: {len(survivors)} candidates, "
+                      f"{duration:.1f}h x {seeds} seeds")
+                
+                scores = self._evaluate(survivors, duration, seeds, executor)
+                simulated_hours += len(survivors) * seeds * duration
+                ranking = self._rank(scores)
+                
+                self.history.append({
+                    'rung': rung,
+                    'duration_hours': duration,
+                    'seeds': seeds,
+                    'scores': {str(i): scores[i] for i in ranking}
+                })
+                
+                if rung < self.rungs - 1:
+                    survivors = ranking[:max(1, len(ranking) // self.eta)]
+        
+        # Pareto front among the candidates that reached the full budget
+        fronts = pareto_ranks([(scores[i]['throughput_orders_per_hour'], scores[i]['average_lead_time_hours'])
+                               for i in ranking])
+        front = [i for i, rank in zip(ranking, fronts) if rank == 0]
+        
+        full_duration, _ = self.rung_budget(self.rungs - 1)
+        return {
+            'best_candidate': ranking[0],
+            'best_parameters': self.candidates[ranking[0]],
+            'best_kpis': scores[ranking[0]],
+            'pareto_front': [{'candidate': i, 'parameters': self.candidates[i], 'kpis': scores[i]}
+                             for i in front],
+            'candidates': self.candidates,
+            'history': self.history,
+            'screened_candidates': self.screened,
+            'simulated_hours': simulated_hours,
+            'exhaustive_simulated_hours': len(self.candidates) * self.seeds * full_duration
+        }
+
+def save_optimization_results(results: Dict[str, Any], base_config: Dict[str, Any],
+                              output_dir: str = 'results/optimization'):
+    """Save the search history and the best configuration as YAML"""
+    os.makedirs(output_dir, exist_ok=True)
+    
+    with open(os.path.join(output_dir, 'optimization_results.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+    
+    best_config = apply_parameters(base_config, results['best_parameters'])
+    with open(os.path.join(output_dir, 'config_best.yaml'), 'w') as f:
+        yaml.safe_dump(best_config, f, sort_keys=False)
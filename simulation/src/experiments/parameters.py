@@ -0,0 +1,106 @@
+"""
+Config Parameters - Addressing and sampling parameters of the YAML config
+"""
+
+import copy
+import itertools
+import numpy as np
+from typing import Dict, List, Any
+
+# Parameters the configuration marks as MODIFIABLE, as dotted paths into the config
+MODIFIABLE_PARAMETERS = [
+    'parts_warehouse.initial_parts',
+    'parts_warehouse.capacity',
+    'parts_warehouse.replenishment_interval_hours',
+    'parts_warehouse.replenishment_quantity',
+    'production_line.buffer_A_B_size',
+    'production_line.buffer_B_C_size',
+    'production_line.machines.0.processing_time_minutes',
+    'production_line.machines.1.processing_time_minutes',
+    'production_line.machines.2.processing_time_minutes',
+    'finished_storage.capacity',
+    'logistics.lorry_capacity'
+]
+
+def split_path(path: str) -> List[Any]:
+    """Split a dotted path; numeric parts index into lists"""
+    return [int(part) if part.isdigit() else part for part in path.split('.')]
+
+def get_parameter(config: Dict[str, Any], path: str) -> Any:
+    """Get the value of a dotted parameter path such as 'production_line.buffer_A_B_size'"""
+    node = config
+    for key in split_path(path):
+        try:
+            node = node[key]
+        except (KeyError, IndexError, TypeError):
+            raise KeyError(f"Parameter '{path}' not found in config")
+    return node
+
+def set_parameter(config: Dict[str, Any], path: str, value: Any):
+    """Set an existing dotted parameter path in place"""
+    get_parameter(config, path)  # Only existing parameters may be set
+    keys = split_path(path)
+    node = config
+    for key in keys[:-1]:
+        node = node[key]
+    node[keys[-1]] = value
+
+def apply_parameters(config: Dict[str, Any], parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of the config with the given parameter values applied"""
+    config = copy.deepcopy(config)
+    for path, value in parameters.items():
+        set_parameter(config, path, value)
+    return config
+
+def _to_python(value: Any) -> Any:
+    """Convert NumPy scalars so points serialize cleanly to YAML/JSON"""
+    return value.item() if isinstance(value, np.generic) else value
+
+def _grid_values(spec: Any) -> List[Any]:
+    """All values of a parameter for a full-factorial grid"""
+    if isinstance(spec, list):
+        return spec
+    steps = spec.get('steps', 5)
+    values = np.linspace(spec['low'], spec['high'], steps)
+    if spec.get('type', 'float') == 'int':
+        return sorted(set(int(round(v)) for v in values))
+    return [float(v) for v in values]
+
+def _scale(spec: Any, u: float) -> Any:
+    """Map a uniform draw u in [0, 1) onto a parameter's range or choices"""
+    if isinstance(spec, list):
+        return spec[min(int(u * len(spec)), len(spec) - 1)]
+    low, high = spec['low'], spec['high']
+    if spec.get('type', 'float') == 'int':
+        return min(int(low + u * (high - low + 1)), high)
+    return float(low + u * (high - low))
+
+def generate_points(parameters: Dict[str, Any], method: str = 'grid', samples: int = 10,
+                    seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate design points from parameter specs.
+    
+    Each spec is either a list of values or a range {low, high, type: int|float, steps}.
+    Methods: 'grid' (full factorial), 'random' (uniform) and 'lhs' (Latin hypercube).
+    Points are deterministic for a given seed.
+    """
+    names = list(parameters)
+    
+    if method == 'grid':
+        grids = [_grid_values(parameters[name]) for name in names]
+        points = [dict(zip(names, combination)) for combination in itertools.product(*grids)]
+    elif method == 'random':
+        rng = np.random.default_rng(seed)
+        draws = rng.random((samples, len(names)))
+        points = [{name: _scale(parameters[name], u) for name, u in zip(names, row)} for row in draws]
+    elif method == 'lhs':
+        rng = np.random.default_rng(seed)
+        draws = np.empty((samples, len(names)))
+        for j in range(len(names)):
+            # One draw from each of `samples` equal strata, in random order
+            draws[:, j] = (rng.permutation(samples) + rng.random(samples)) / samples
+        points = [{name: _scale(parameters[name], u) for name, u in zip(names, row)} for row in draws]
+    else:
+        raise ValueError(f"Unknown sampling method '{method}' (expected grid, random or lhs)")
+    
+    return [{name: _to_python(value) for name, value in point.items()} for point in points]
@@ -0,0 +1,91 @@
+"""
+Replication Runner - Run independent seeds of one configuration in parallel
+"""
+
+import os
+import copy
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional
+from simulation import FactorySimulation
+from experiments.cache import ResultCache
+from analysis.statistics import summarize_kpis
+
+def init_worker():
+    """Keep worker processes from flooding the console and simulation.log"""
+    logging.basicConfig(level=logging.ERROR)
+
+def run_replication(config: Dict[str, Any], seed: int, antithetic: bool = False) -> Dict[str, float]:
+    """Run one replication and return only its compact KPI dict"""
+    config = copy.deepcopy(config)
+    config['simulation']['random_seed'] = seed
+    config['simulation']['antithetic'] = antithetic
+    # Only the KPIs are sent back (a detected warm-up needs the event log)
+    config['simulation']['streaming_kpis'] = config['simulation'].get('warmup_hours') != 'auto'
+    config['simulation'].pop('spill_dir', None)  # Parallel runs must not share one spill directory
+    
+    cache = ResultCache.from_config(config)
+    if cache is not None:
+        kpis = cache.get_kpis(config)
+        if kpis is not None:
+            return kpis
+    
+    factory = FactorySimulation(config)
+    factory.simulate()
+    
+    # Plain floats keep the result small to pickle back to the parent
+    kpis = {name: float(value) for name, value in factory.data_collector.calculate_kpis().items()}
+    if cache is not None:
+        cache.put(config, kpis)
+    return kpis
+
+def _pair_mean(first: Dict[str, float], second: Dict[str, float]) -> Dict[str, float]:
+    """Mean of two KPI dicts over the KPIs both runs produced"""
+    return {name: (value + second[name]) / 2.0 for name, value in first.items() if name in second}
+
+def run_replications(config: Dict[str, Any], replications: int,
+                     workers: Optional[int] = None,
+                     base_seed: Optional[int] = None,
+                     antithetic: bool = False) -> List[Dict[str, float]]:
+    """
+    Run N replications with seeds base_seed, base_seed + 1, ... on a process pool.
+    
+    With antithetic=True each replication is a pair of runs on the same seed,
+    the second one on mirrored uniforms (1 - U), and the pair mean is returned
+    as its sample. The negative correlation within a pair narrows the
+    confidence interval for the same number of independent samples.
+    """
+    if replications < 1:
+        raise ValueError(f"Number of replications must be positive, got {replications}")
+    if base_seed is None:
+        base_seed = config['simulation']['random_seed']
+    
+    seeds = [base_seed + i for i in range(replications)]
+    runs = 2 * replications if antithetic else replications
+    workers = min(workers or os.cpu_count() or 1, runs)
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        return run_seeds(executor, config, seeds, antithetic)
+
+def run_seeds(executor: ProcessPoolExecutor, config: Dict[str, Any], seeds: List[int],
+              antithetic: bool = False) -> List[Dict[str, float]]:
+    """KPIs of one replication per seed on an existing pool (pair means if antithetic)"""
+    if not antithetic:
+        return list(executor.map(run_replication, [config] * len(seeds), seeds))
+    
+    regular = executor.map(run_replication, [config] * len(seeds), seeds)
+    mirrored = executor.map(run_replication, [config] * len(seeds), seeds, [True] * len(seeds))
+    return [_pair_mean(first, second) for first, second in zip(regular, mirrored)]
+
+def replicate(config: Dict[str, Any], replications: int, workers: Optional[int] = None,
+              confidence: float = 0.95, antithetic: bool = False) -> Dict[str, Any]:
+    """Run replications and summarize every KPI with mean, std and confidence interval"""
+    kpi_samples = run_replications(config, replications, workers, antithetic=antithetic)
+    
+    return {
+        'replications': replications,
+        'antithetic': antithetic,
+        'confidence': confidence,
+        'samples': kpi_samples,
+        'summary': summarize_kpis(kpi_samples, confidence)
+    }
@@ -0,0 +1,70 @@
+"""
+Config Screening - Rank configs by their analytical KPI estimates and measure the estimates' error
+"""
+
+import time
+from typing import Dict, List, Any, Optional
+from approximation import FactoryApproximation, machine_names, utilization_kpi
+from experiments.parameters import apply_parameters
+from experiments.replication import run_replications
+from analysis.statistics import summarize_kpis
+
+# KPIs of the estimate that validation reports first
+HEADLINE_KPIS = ('throughput_orders_per_hour', 'average_lead_time_hours', 'average_wip')
+
+def estimate_candidates(base_config: Dict[str, Any], candidates: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+    """Estimated KPIs of the base config with each candidate's parameters applied"""
+    return [FactoryApproximation(apply_parameters(base_config, parameters)).estimate() for parameters in candidates]
+
+def simulated_wip(kpis: Dict[str, float], config: Dict[str, Any]) -> float:
+    """
+    Orders in the factory in a simulated run, under the estimate's definition.
+    
+    Pending orders, the production buffers, and the items in process (each
+    machine's utilization times its servers).
+    """
+    wip = kpis.get('average_pending_orders', 0.0)
+    wip += sum(value for name, value in kpis.items() if name.startswith('average_buffer_'))
+    for machine_config in config['production_line']['machines']:
+        for name in machine_names(machine_config):
+            wip += kpis.get(utilization_kpi(name), 0.0) * machine_config.get('servers', 1)
+    return wip
+
+def validate_approximation(config: Dict[str, Any], replications: int = 10, workers: Optional[int] = None,
+                           confidence: float = 0.95) -> Dict[str, Any]:
+    """
+    Error of the analytical estimate of a config against its simulated KPIs.
+    
+    The config is simulated for `replications` seeds (through the result
+    cache if one is configured); for every KPI both produce, the estimate is
+    compared with the simulated mean and its confidence interval.
+    """
+    started = time.perf_counter()
+    estimates = FactoryApproximation(config).estimate()
+    estimate_seconds = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    samples = run_replications(config, replications, workers)
+    simulate_seconds = time.perf_counter() - started
+    for kpis in samples:
+        kpis['average_wip'] = simulated_wip(kpis, config)
+    summary = summarize_kpis(samples, confidence)
+    
+    names = [name for name in HEADLINE_KPIS if name in summary]
+    names += [name for name in estimates if name in summary and name not in names]
+    comparison = {}
+    for name in names:
+        simulated = summary[name]['mean']
+        comparison[name] = {
+            'estimate': estimates[name],
+            'simulated': simulated,
+            'half_width': summary[name]['half_width'],
+            'relative_error': (estimates[name] - simulated) / abs(simulated) if simulated else float('nan')
+        }
+    return {
+        'replications': replications,
+        'confidence': confidence,
+        'estimate_seconds': estimate_seconds,
+        'simulate_seconds': simulate_seconds,
+        'kpis': comparison
+    }
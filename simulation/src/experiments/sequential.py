@@ -0,0 +1,143 @@
+"""
+Sequential Stopping - Add replications or batches until the KPIs reach a target precision
+"""
+
+import os
+import math
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Sequence
+from simulation import FactorySimulation
+from analysis.statistics import summarize_kpis
+from experiments.replication import init_worker, run_seeds
+
+DEFAULT_PRECISION_KPIS = ('throughput_orders_per_hour', 'average_lead_time_hours')
+MIN_REPLICATIONS = 5
+MIN_BATCHES = 10
+
+def relative_half_widths(summary: Dict[str, Dict[str, float]], kpis: Sequence[str]) -> Dict[str, float]:
+    """Confidence interval half-width over |mean| of each KPI (inf while it cannot be estimated)"""
+    widths = {}
+    for name in kpis:
+        stats = summary.get(name, {})
+        if stats.get('n', 0) < 2:
+            widths[name] = math.inf
+        elif stats['half_width'] == 0:
+            widths[name] = 0.0
+        elif stats['mean'] == 0:
+            widths[name] = math.inf
+        else:
+            widths[name] = stats['half_width'] / abs(stats['mean'])
+    return widths
+
+def _required_samples(samples: int, widths: Dict[str, float], precision: float) -> int:
+    """
+    Samples needed for the widest KPI, assuming the half-width shrinks with
+    1 / sqrt(n) (the usual two-stage estimate n * (h / target)^2).
+    """
+    widest = max(widths.values())
+    if math.isinf(widest):
+        return 2 * samples
+    return math.ceil(samples * (widest / precision) ** 2)
+
+def _result(samples: List[Dict[str, float]], kpis: Sequence[str], precision: float,
+            confidence: float) -> Dict[str, Any]:
+    summary = summarize_kpis(samples, confidence)
+    widths = relative_half_widths(summary, kpis)
+    return {
+        'replications': len(samples),
+        'confidence': confidence,
+        'precision': precision,
+        'precision_kpis': list(kpis),
+        'relative_half_widths': widths,
+        'converged': all(width <= precision for width in widths.values()),
+        'samples': samples,
+        'summary': summary
+    }
+
+def replicate_until(config: Dict[str, Any], precision: float = 0.05,
+                    kpis: Sequence[str] = DEFAULT_PRECISION_KPIS, confidence: float = 0.95,
+                    max_replications: int = 200, workers: Optional[int] = None,
+                    antithetic: bool = False) -> Dict[str, Any]:
+    """
+    Run replications until every KPI in `kpis` has a confidence interval
+    half-width of at most `precision` times its mean, or max_replications.
+    
+    After MIN_REPLICATIONS the number still needed is estimated from the
+    widest interval and launched as one round, at least one per worker (so no
+    core idles) and at most as many as already ran (early variance estimates
+    are noisy, so this caps the overshoot at twice the need). Seeds continue
+    from random_seed, so a stopped run gives the same samples as `replicate`
+    with the same count.
+    """
+    if precision <= 0:
+        raise ValueError(f"Precision must be positive, got {precision}")
+    if max_replications <= 0:
+        raise ValueError(f"Maximum number of replications must be positive, got {max_replications}")
+    base_seed = config['simulation']['random_seed']
+    workers = workers or os.cpu_count() or 1
+    samples = []
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        batch = min(max(MIN_REPLICATIONS, workers), max_replications)
+        while batch > 0:
+            seeds = [base_seed + len(samples) + i for i in range(batch)]
+            samples.extend(run_seeds(executor, config, seeds, antithetic))
+            
+            result = _result(samples, kpis, precision, confidence)
+            if result['converged']:
+                break
+            needed = _required_samples(len(samples), result['relative_half_widths'], precision)
+            batch = min(max(min(needed - len(samples), len(samples)), workers),
+                        max_replications - len(samples))
+    
+    result['antithetic'] = antithetic
+    return result
+
+def batch_means_until(config: Dict[str, Any], precision: float = 0.05,
+                      kpis: Sequence[str] = DEFAULT_PRECISION_KPIS, confidence: float = 0.95,
+                      batch_hours: Optional[float] = None, max_batches: int = 200) -> Dict[str, Any]:
+    """
+    Extend one long run batch by batch until the batch-means confidence
+    interval of every KPI in `kpis` reaches the relative `precision`.
+    
+    The run uses streaming KPIs and warms up once (warmup_hours, which must be
+    a number). Batches default to 1/MIN_BATCHES of the configured duration
+    after the warm-up; they should be long compared with a lead time, or the
+    batch means are correlated and the interval is too narrow.
+    """
+    if precision <= 0:
+        raise ValueError(f"Precision must be positive, got {precision}")
+    if max_batches <= 0:
+        raise ValueError(f"Maximum number of batches must be positive, got {max_batches}")
+    config = copy.deepcopy(config)
+    sim_config = config['simulation']
+    sim_config['streaming_kpis'] = True
+    warmup = sim_config.get('warmup_hours', 0.0)
+    if warmup == 'auto':
+        raise ValueError("Batch means warm up once for a set time: warmup_hours must be a number, not 'auto'")
+    if batch_hours is None:
+        batch_hours = (sim_config['duration_hours'] - warmup) / MIN_BATCHES
+    if batch_hours <= 0:
+        raise ValueError(f"Batch length must be positive, got {batch_hours}")
+    
+    # The collector starts counting at the warm-up, so the first batch begins there
+    factory = FactorySimulation(config)
+    collector = factory.data_collector
+    samples = []
+    try:
+        factory.start()
+        while len(samples) < max_batches:
+            factory.advance(warmup + (len(samples) + 1) * batch_hours)
+            samples.append({name: float(value) for name, value in collector.close_batch().items()})
+            
+            if len(samples) >= MIN_BATCHES:
+                result = _result(samples, kpis, precision, confidence)
+                if result['converged']:
+                    break
+    finally:
+        factory.close()
+    
+    result = _result(samples, kpis, precision, confidence)
+    result.update({'method': 'batch_means', 'batch_hours': batch_hours, 'warmup_hours': warmup})
+    return result
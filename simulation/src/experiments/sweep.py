@@ -0,0 +1,152 @@
+"""
+Parameter Sweep - Design-of-experiments runs over the YAML config
+"""
+
+import os
+import copy
+import json
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional
+from experiments.parameters import apply_parameters, generate_points, get_parameter
+from experiments.replication import run_replication, init_worker
+from experiments.branching import Snapshot, check_live_parameter
+
+class ParameterSweep:
+    """Runs every (config point, seed) combination of a sweep and tabulates the KPIs"""
+    
+    def __init__(self, base_config: Dict[str, Any], parameters: Dict[str, Any],
+                 method: str = 'grid', samples: int = 10, seeds: Any = 1,
+                 sampling_seed: int = 0, output_dir: str = 'results/sweep',
+                 snapshot_hours: Optional[float] = None):
+        self.base_config = base_config
+        self.parameters = parameters
+        self.output_dir = output_dir
+        self.snapshot_hours = snapshot_hours  # Shared prefix every point of a seed branches from
+        
+        # Fail early on typos rather than hours into the sweep
+        for path in parameters:
+            get_parameter(base_config, path)
+            if snapshot_hours is not None:
+                check_live_parameter(path)
+        
+        self.points = generate_points(parameters, method, samples, sampling_seed)
+        
+        # Either an explicit list of seeds or a count starting at the config's seed
+        if isinstance(seeds, int):
+            base_seed = base_config['simulation']['random_seed']
+            seeds = [base_seed + i for i in range(seeds)]
+        self.seeds = list(seeds)
+        
+        self.runs_path = os.path.join(output_dir, 'sweep_runs.jsonl')
+        self.table_path = os.path.join(output_dir, 'sweep_results.csv')
+    
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any], base_config: Dict[str, Any],
+                  output_dir: str = 'results/sweep') -> 'ParameterSweep':
+        """Build a sweep from a parsed sweep YAML file"""
+        return cls(
+            base_config,
+            parameters=spec['parameters'],
+            method=spec.get('method', 'grid'),
+            samples=spec.get('samples', 10),
+            seeds=spec.get('seeds', 1),
+            sampling_seed=spec.get('sampling_seed', 0),
+            output_dir=output_dir,
+            snapshot_hours=spec.get('snapshot_hours')
+        )
+    
+    def _load_completed(self) -> List[Dict[str, Any]]:
+        """Read runs completed by a previous, possibly interrupted, invocation"""
+        if not os.path.exists(self.runs_path):
+            return []
+        
+        rows = []
+        with open(self.runs_path, 'r') as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Last line may be truncated if the sweep was killed mid-write
+                    continue
+        
+        for row in rows:
+            point = self.points[row['point_id']] if row['point_id'] < len(self.points) else None
+            if point is None or any(row[name] != value for name, value in point.items()):
+                raise ValueError(f"{self.runs_path} was produced by a different sweep definition; "
+                                 f"use a new output directory")
+        return rows
+    
+    def run(self, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Run all pending (point, seed) combinations and write the results table"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        rows = self._load_completed()
+        done = {(row['point_id'], row['seed']) for row in rows}
+        pending = [(point_id, seed)
+                   for point_id in range(len(self.points))
+                   for seed in self.seeds
+                   if (point_id, seed) not in done]
+        
+        total = len(self.points) * len(self.seeds)
+        print(f"Sweep: {len(self.points)} points x {len(self.seeds)} seeds, "
+              f"{len(done)} of {total} runs already completed")
+        
+        if pending:
+            with open(self.runs_path, 'a') as runs_file:
+                def record(point_id: int, seed: int, kpis: Dict[str, float]):
+                    row = {'point_id': point_id, 'seed': seed, **self.points[point_id], **kpis}
+                    rows.append(row)
+                    
+                    # One line per finished run so an interrupted sweep can resume
+                    runs_file.write(json.dumps(row) + '\n')
+                    runs_file.flush()
+                    
+                    completed = len(rows)
+                    if completed % 10 == 0 or completed == total:
+                        print(f"Sweep progress: {completed}/{total} runs")
+                
+                if self.snapshot_hours is None:
+                    self._run_independent(pending, workers, record)
+                else:
+                    self._run_branched(pending, workers, record)
+        
+        self.write_table(rows)
+        return rows
+    
+    def _run_independent(self, pending: List[tuple], workers: Optional[int], record):
+        """Every (point, seed) as a full run on a process pool"""
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            futures = {
+                executor.submit(run_replication,
+                                apply_parameters(self.base_config, self.points[point_id]),
+                                seed): (point_id, seed)
+                for point_id, seed in pending
+            }
+            for future in as_completed(futures):
+                record(*futures[future], future.result())
+    
+    def _run_branched(self, pending: List[tuple], workers: Optional[int], record):
+        """Per seed, run the first snapshot_hours once and branch every point off it"""
+        init_worker()  # The warm-ups run in this process; keep them as quiet as the pool's
+        for seed in self.seeds:
+            point_ids = [point_id for point_id, point_seed in pending if point_seed == seed]
+            if not point_ids:
+                continue
+            
+            config = copy.deepcopy(self.base_config)
+            config['simulation']['random_seed'] = seed
+            config['simulation']['streaming_kpis'] = config['simulation'].get('warmup_hours') != 'auto'
+            snapshot = Snapshot(config, self.snapshot_hours)
+            try:
+                branches = [self.points[point_id] for point_id in point_ids]
+                for index, kpis in snapshot.iter_branches(branches, workers):
+                    record(point_ids[index], seed, kpis)
+            finally:
+                snapshot.close()
+    
+    def write_table(self, rows: List[Dict[str, Any]]):
+        """Write one row per (config point, seed) to the results CSV"""
+        table = pd.DataFrame(rows).sort_values(['point_id', 'seed'])
+        table.to_csv(self.table_path, index=False)
@@ -3,40 +3,123 @@ Factory Simulation - Main Simulation Logic
 """
 
 import simpy
-import random
+import queue
 import logging
-from typing import Dict, List, Any
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Any, Optional
 from components.warehouse import PartsWarehouse
 from components.machine import ProductionMachine
 from components.logistics import LorryDriver
+from components.buffers import TrackedStore
+from components.random_streams import RandomStreams
 from analysis.data_collector import DataCollector
+from analysis.results import SimulationResults
+from analysis.spill import CHUNK_EVENTS
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOGGING_MODES = ('standard', 'performance')
+
+# Per-order messages go to '<module>.orders' child loggers so that sweeps can
+# silence them while failures, repairs and car issues are still logged
+ORDER_LOGGERS = ('simulation.orders', 'components.machine.orders',
+                 'components.warehouse.orders', 'components.logistics.orders')
+
+def stage_label(machine_name: str) -> str:
+    """Label of a stage in buffer names: the last word of its machine name ('Machine A' -> 'A')"""
+    return machine_name.split()[-1]
+
+def buffer_size(production_config: Dict[str, Any], buffer_name: str) -> int:
+    """Capacity of a buffer: '<buffer_name>_size', else 'default_buffer_size'"""
+    size = production_config.get(f'{buffer_name}_size', production_config.get('default_buffer_size'))
+    if size is None:
+        raise ValueError(f"production_line needs '{buffer_name}_size' or 'default_buffer_size'")
+    return size
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues records unformatted; the listener thread formats them"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 class FactorySimulation:
     """Main factory simulation class"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], env: Optional[simpy.Environment] = None):
         self.config = config
-        self.env = simpy.Environment()
-        self.data_collector = DataCollector()
+        self.env = env if env is not None else simpy.Environment()  # e.g. an instrumented subclass
+        sim_config = config['simulation']
+        streaming = sim_config.get('streaming_kpis', False)
+        warmup = sim_config.get('warmup_hours', 0.0)
+        if warmup == 'auto':
+            if streaming:
+                raise ValueError("warmup_hours: auto needs the event log, set a number with streaming_kpis")
+        elif not 0 <= warmup < sim_config['duration_hours']:
+            raise ValueError(f"warmup_hours must be 'auto' or in [0, duration_hours), got {warmup}")
+        spill_dir = sim_config.get('spill_dir')
+        if spill_dir is not None and streaming:
+            raise ValueError("spill_dir needs the event log, which streaming_kpis does not keep")
+        self.data_collector = DataCollector(streaming=streaming, warmup=warmup, spill_dir=spill_dir,
+                                            chunk_events=sim_config.get('spill_chunk_events', CHUNK_EVENTS))
         
-        # Set random seed for reproducibility
-        random.seed(config['simulation']['random_seed'])
+        # One independent stream per stochastic source, all derived from the seed
+        self.random_streams = RandomStreams(sim_config['random_seed'],
+                                            replication=sim_config.get('replication', 0),
+                                            antithetic=sim_config.get('antithetic', False))
         
         # Initialize components
         self._setup_components()
         self._setup_logging()
+        self._started = False
     
     def _setup_logging(self):
-        """Setup logging configuration"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('simulation.log'),
-                logging.StreamHandler()
-            ]
-        )
+        """
+        Setup logging configuration.
+        
+        In 'performance' mode records are queued and formatted and written by a
+        QueueListener thread, so file I/O stays off the simulation thread.
+        """
+        sim_config = self.config['simulation']
+        mode = sim_config.get('logging_mode', 'standard')
+        if mode not in LOGGING_MODES:
+            raise ValueError(f"Unknown logging_mode '{mode}', expected one of {LOGGING_MODES}")
+        level = logging.getLevelName(str(sim_config.get('log_level', 'INFO')).upper())
+        if not isinstance(level, int):
+            raise ValueError(f"Unknown log_level '{sim_config['log_level']}'")
+        
         self.logger = logging.getLogger(__name__)
+        self.order_logger = logging.getLogger(f'{__name__}.orders')
+        self._log_listener = None
+        self._log_handler = None
+        
+        order_level = logging.NOTSET if sim_config.get('log_orders', True) else logging.WARNING
+        for name in ORDER_LOGGERS:
+            logging.getLogger(name).setLevel(order_level)
+        
+        # Already configured (e.g. by a replication worker): keep those handlers
+        if logging.getLogger().handlers:
+            return
+        
+        handlers = [logging.FileHandler('simulation.log'), logging.StreamHandler()]
+        if mode == 'performance':
+            formatter = logging.Formatter(LOG_FORMAT)
+            for handler in handlers:
+                handler.setFormatter(formatter)
+            log_queue = queue.SimpleQueue()
+            self._log_listener = QueueListener(log_queue, *handlers)
+            self._log_handler = _DeferredQueueHandler(log_queue)
+            handlers = [self._log_handler]
+        
+        logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers)
+    
+    def _teardown_logging(self):
+        """Flush and detach the queued logging of performance mode"""
+        if self._log_listener is None:
+            return
+        self._log_listener.stop()
+        logging.getLogger().removeHandler(self._log_handler)
+        for handler in self._log_listener.handlers:
+            handler.close()
+        self._log_listener = None
     
     def _setup_components(self):
         """Initialize all simulation components"""
@@ -51,29 +134,30 @@ class FactorySimulation:
             data_collector=self.data_collector
         )
         
-        # Production machines
+        # Order arrivals
+        self.interarrival_time = self.random_streams.sampler(
+            'order_arrival', self.config['order_arrival']['interarrival_time_hours'])
+        
+        # Production line: one stage per entry of production_line.machines
         production_config = self.config['production_line']
-        self.machines = []
-        
-        for i, machine_config in enumerate(production_config['machines']):
-            machine = ProductionMachine(
-                self.env,
-                name=machine_config['name'],
-                processing_time=machine_config['processing_time_minutes'],
-                mtbf=machine_config['mtbf_hours'],
-                mttr=machine_config['mttr_hours'],
-                data_collector=self.data_collector
-            )
-            self.machines.append(machine)
-        
-        # Buffers between machines
-        self.pending_orders = simpy.Store(self.env)
-        self.buffer_A_B = simpy.Store(self.env, capacity=production_config['buffer_A_B_size'])
-        self.buffer_B_C = simpy.Store(self.env, capacity=production_config['buffer_B_C_size'])
+        self.stages = self._build_stages(production_config)
+        self.machines = [machine for stage in self.stages for machine in stage]
+        
+        # Buffers between consecutive stages (each reports its level changes)
+        self.pending_orders = TrackedStore(self.env, 'pending_orders', self.data_collector)
+        labels = [stage_label(machine_config['name']) for machine_config in production_config['machines']]
+        if len(set(labels)) != len(labels):
+            raise ValueError(f"Stage labels must be unique to name the buffers, got {labels}")
+        self.buffers = []
+        for upstream, downstream in zip(labels, labels[1:]):
+            name = f'buffer_{upstream}_{downstream}'
+            self.buffers.append(TrackedStore(self.env, f'{name}_level', self.data_collector,
+                                             capacity=buffer_size(production_config, name)))
         
         # Finished products storage
         storage_config = self.config['finished_storage']
-        self.finished_storage = simpy.Store(self.env, capacity=storage_config['capacity'])
+        self.finished_storage = TrackedStore(self.env, 'finished_storage_level', self.data_collector,
+                                             capacity=storage_config['capacity'])
         
         # Logistics
         logistics_config = self.config['logistics']
@@ -83,21 +167,56 @@ class FactorySimulation:
             capacity=logistics_config['lorry_capacity'],
             car_issue_prob=logistics_config['driver']['car_issue_prob'],
             issue_delay=logistics_config['driver']['issue_delay_hours'],
-            data_collector=self.data_collector
+            data_collector=self.data_collector,
+            num_lorries=logistics_config.get('num_lorries', 1),
+            round_trip=logistics_config.get('round_trip_hours', 2.0),
+            max_wait=logistics_config.get('max_wait_hours'),
+            random_streams=self.random_streams
         )
     
+    def _build_stages(self, production_config: Dict[str, Any]) -> List[List[ProductionMachine]]:
+        """
+        Machines of every stage of the line.
+        
+        A stage with `parallel: n` gets n identical machines (numbered, each
+        failing on its own) sharing the stage's input buffer; `servers: k` lets
+        each machine process k items at once.
+        """
+        stages = []
+        for machine_config in production_config['machines']:
+            parallel = machine_config.get('parallel', 1)
+            servers = machine_config.get('servers', 1)
+            if parallel < 1 or servers < 1:
+                raise ValueError(f"{machine_config['name']}: parallel and servers must be at least 1")
+            
+            names = ([machine_config['name']] if parallel == 1 else
+                     [f"{machine_config['name']} {i + 1}" for i in range(parallel)])
+            stages.append([
+                ProductionMachine(
+                    self.env,
+                    name=name,
+                    processing_time=machine_config['processing_time_minutes'],
+                    mtbf=machine_config['mtbf_hours'],
+                    mttr=machine_config['mttr_hours'],
+                    data_collector=self.data_collector,
+                    servers=servers,
+                    random_streams=self.random_streams
+                )
+                for name in names
+            ])
+        return stages
+    
     def order_arrival_process(self):
         """Process for generating customer orders"""
         order_id = 0
-        arrival_config = self.config['order_arrival']
         
         while True:
-            # Wait for next order arrival (exponential distribution)
-            interarrival_time = random.expovariate(1.0 / arrival_config['interarrival_time_hours'])
+            # Wait for next order arrival (exponential unless configured otherwise)
+            interarrival_time = self.interarrival_time()
             yield self.env.timeout(interarrival_time)
             
             order_id += 1
-            self.logger.info(f"Order {order_id} arrived at time {self.env.now:.2f}")
+            self.order_logger.info("Order %d arrived at time %.2f", order_id, self.env.now)
             
             # Record order arrival
             self.data_collector.record_event('order_arrival', {
@@ -107,79 +226,91 @@ class FactorySimulation:
             
             # Put order into pending queue
             yield self.pending_orders.put(order_id)
-
-    def machine_a_worker(self):
-        """Process for Machine A pulling from pending orders"""
-        while True:
-            order_id = yield self.pending_orders.get()
-            
-            # Get parts from warehouse
-            yield self.env.process(self.warehouse.get_parts(1))
-            
-            # Process through Machine A
-            yield self.env.process(self.machines[0].process_item(order_id))
-            
-            # Move to buffer A-B
-            yield self.buffer_A_B.put(order_id)
-            self.data_collector.record_metric('buffer_A_B_level', len(self.buffer_A_B.items), self.env.now)
-
-    def machine_b_worker(self):
-        """Process for Machine B pulling from buffer A-B"""
-        while True:
-            order_id = yield self.buffer_A_B.get()
-            self.data_collector.record_metric('buffer_A_B_level', len(self.buffer_A_B.items), self.env.now)
-            
-            # Process through Machine B
-            yield self.env.process(self.machines[1].process_item(order_id))
-            
-            # Move to buffer B-C
-            yield self.buffer_B_C.put(order_id)
-            self.data_collector.record_metric('buffer_B_C_level', len(self.buffer_B_C.items), self.env.now)
-
-    def machine_c_worker(self):
-        """Process for Machine C pulling from buffer B-C"""
+    
+    def stage_worker(self, stage: int, machine: ProductionMachine):
+        """Process owning one server of a machine, pulling from its stage's input buffer"""
+        first = stage == 0
+        last = stage == len(self.stages) - 1
+        source = self.pending_orders if first else self.buffers[stage - 1]
+        target = self.finished_storage if last else self.buffers[stage]
+        
         while True:
-            order_id = yield self.buffer_B_C.get()
-            self.data_collector.record_metric('buffer_B_C_level', len(self.buffer_B_C.items), self.env.now)
+            order_id = yield source.get()
             
-            # Process through Machine C
-            yield self.env.process(self.machines[2].process_item(order_id))
+            # The first stage takes the parts from the warehouse (inlined, no child process)
+            if first:
+                yield from self.warehouse.get_parts(1)
             
-            # Move to finished storage
-            yield self.finished_storage.put(order_id)
-            self.data_collector.record_metric('finished_storage_level', len(self.finished_storage.items), self.env.now)
+            # Process through this machine. Each worker owns one of its servers,
+            # so the Resource request and the child process are skipped
+            yield from machine.process_item_exclusive(order_id)
             
-            self.logger.info(f"Order {order_id} completed at time {self.env.now:.2f}")
+            # Move to the next buffer (blocks while it is full)
+            yield target.put(order_id)
             
-            # Record completion
-            self.data_collector.record_event('order_completed', {
-                'order_id': order_id,
-                'time': self.env.now
-            })
-
-    def run(self) -> Dict[str, Any]:
+            if last:
+                self.order_logger.info("Order %d completed at time %.2f", order_id, self.env.now)
+                
+                # Record completion
+                self.data_collector.record_event('order_completed', {
+                    'order_id': order_id,
+                    'time': self.env.now
+                })
+    
+    def run(self) -> SimulationResults:
         """Run the simulation and return results"""
+        self.simulate()
+        
+        # Return collected data
+        return self.data_collector.get_results()
+    
+    def simulate(self):
+        """Run the simulation without building the results (KPIs stay in the collector)"""
         duration = self.config['simulation']['duration_hours']
         
-        self.logger.info(f"Starting simulation for {duration} hours")
+        try:
+            self.logger.info("Starting simulation for %s hours", duration)
+            self.start()
+            self.advance(duration)
+            self.logger.info("Simulation completed")
+        finally:
+            self.close()
+    
+    def start(self):
+        """Start every process at time 0 without advancing the clock"""
+        if self._started:
+            return
+        self._started = True
+        
+        if self._log_listener is not None:
+            self._log_listener.start()
         
         # Start processes
         self.env.process(self.order_arrival_process())
-        self.env.process(self.machine_a_worker())
-        self.env.process(self.machine_b_worker())
-        self.env.process(self.machine_c_worker())
+        for stage, machines in enumerate(self.stages):
+            for machine in machines:
+                for _ in range(machine.servers):
+                    self.env.process(self.stage_worker(stage, machine))
         
         self.env.process(self.warehouse.replenishment_process())
-        self.env.process(self.lorry_driver.departure_process())
+        for lorry in range(self.lorry_driver.num_lorries):
+            self.env.process(self.lorry_driver.departure_process(lorry))
         
         # Start machine failure processes
         for machine in self.machines:
             self.env.process(machine.failure_process())
+    
+    def advance(self, until: float):
+        """
+        Run a started simulation up to `until` hours.
         
-        # Run simulation
-        self.env.run(until=duration)
-        
-        self.logger.info("Simulation completed")
-        
-        # Return collected data
-        return self.data_collector.get_results()
\ No newline at end of file
+        Can be called repeatedly with increasing times, e.g. to read the KPIs
+        between batches of one long run; call close() when done.
+        """
+        self.env.run(until=until)
+        self.data_collector.finalize(self.env.now)
+    
+    def close(self):
+        """Stop the background logging of performance mode and the spill writer"""
+        self._teardown_logging()
+        self.data_collector.close()